@@ -41,8 +41,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'reports.metrics.RequestMetricsMiddleware',  # First, so latency covers the whole stack
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',  # For serving static files
+    'reports.middleware.StaticFilesMiddleware',  # WhiteNoise static files, usable under ASGI too
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -79,6 +80,25 @@ DATABASES = {
     )
 }
 
+# Opt-in tuning for serving from SQLite with several workers: WAL lets readers
+# run alongside a writer, writers wait for the lock instead of failing, and
+# transactions take the write lock up front (BEGIN IMMEDIATE) so a read-then-write
+# transaction cannot fail to upgrade its lock halfway through.
+SQLITE_PRODUCTION_PROFILE = os.getenv("SQLITE_PRODUCTION_PROFILE", "False") == "True"
+if SQLITE_PRODUCTION_PROFILE and DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    DATABASES['default'].setdefault('OPTIONS', {}).update({
+        'transaction_mode': 'IMMEDIATE',
+        'timeout': int(os.getenv("SQLITE_BUSY_TIMEOUT", 20)),  # seconds; sets busy_timeout
+        # Run on every new connection
+        'init_command': (
+            'PRAGMA journal_mode=WAL;'
+            'PRAGMA synchronous=NORMAL;'
+            'PRAGMA cache_size=-65536;'  # 64 MiB
+            'PRAGMA mmap_size=268435456;'  # 256 MiB
+            'PRAGMA temp_store=MEMORY;'
+        ),
+    })
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -112,6 +132,48 @@ WHITENOISE_USE_FINDERS = True
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Rendered export artifacts, keyed by range and data version, LRU-evicted past the size limit
+EXPORT_CACHE_DIR = Path(os.getenv("EXPORT_CACHE_DIR", MEDIA_ROOT / 'export_cache'))
+EXPORT_CACHE_MAX_BYTES = int(os.getenv("EXPORT_CACHE_MAX_BYTES", 200 * 1024 * 1024))
+
+# Cache for dashboard fragments; entries are keyed by the tasks data version, so
+# a per-process memory cache never serves stale data. Set REDIS_URL to share it.
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv("REDIS_URL"),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'et-portal',
+            'OPTIONS': {'MAX_ENTRIES': 1000},
+        }
+    }
+DASHBOARD_CACHE_TIMEOUT = int(os.getenv("DASHBOARD_CACHE_TIMEOUT", 60 * 60))
+
+# Monthly Parquet files of tasks moved out of the database by archive_tasks, and its default cutoff
+TASK_ARCHIVE_DIR = Path(os.getenv("TASK_ARCHIVE_DIR", BASE_DIR / 'archive'))
+TASK_ARCHIVE_AFTER_DAYS = int(os.getenv("TASK_ARCHIVE_AFTER_DAYS", 365))
+
+# Export jobs RUNNING longer than this (seconds) are taken to have lost their worker and are
+# queued again, up to EXPORT_JOB_MAX_ATTEMPTS claims; finished jobs and their files are
+# deleted after EXPORT_JOB_RETENTION_DAYS
+EXPORT_JOB_TIMEOUT = int(os.getenv("EXPORT_JOB_TIMEOUT", 30 * 60))
+EXPORT_JOB_MAX_ATTEMPTS = int(os.getenv("EXPORT_JOB_MAX_ATTEMPTS", 3))
+EXPORT_JOB_RETENTION_DAYS = int(os.getenv("EXPORT_JOB_RETENTION_DAYS", 7))
+
+# Processes rendering Excel/PDF exports for the export views when served over ASGI (the Procfile's
+# asgi entry sets it); 0 renders them in-process. Pool workers set Django up afresh from this
+# module, so they never see a test database or overridden settings
+EXPORT_PROCESS_WORKERS = int(os.getenv("EXPORT_PROCESS_WORKERS", 0))
+
+# PDF exports with more tasks than this render the detail table in batches of this size
+PDF_CHUNK_ROWS = int(os.getenv("PDF_CHUNK_ROWS", 500))
+
 # Security
 CSRF_COOKIE_SECURE = not DEBUG
 SESSION_COOKIE_SECURE = not DEBUG
@@ -1,5 +1,85 @@
-from django.contrib import admin
-from .models import Engineer, TaskSubmission
+from django.contrib import admin, messages
+from django.db import transaction
+from .inventory import apply_movements
+from .models import Engineer, InventoryItem, InventoryTransaction, TaskSubmission
+from .pagination import EstimatedCountPaginator
 
-admin.site.register(Engineer)
-admin.site.register(TaskSubmission)
\ No newline at end of file
+
+@admin.register(Engineer)
+class EngineerAdmin(admin.ModelAdmin):
+    list_display = ('et_id', 'name', 'user', 'is_team_leader')
+    list_filter = ('is_team_leader',)
+    list_select_related = ('user',)
+    search_fields = ('et_id', 'name')  # also what the engineer autocomplete searches
+    ordering = ('name',)
+    autocomplete_fields = ('user',)
+
+
+@admin.register(TaskSubmission)
+class TaskSubmissionAdmin(admin.ModelAdmin):
+    list_display = ('id', 'submitted_at', 'engineer', 'task_type', 'equipment_type', 'location', 'status')
+    list_filter = ('task_type',)
+    list_select_related = ('engineer',)
+    date_hierarchy = 'submitted_on'
+    # Exact ET ID only: a substring search over task text would scan the table (use /search/ for that)
+    search_fields = ('=engineer__et_id',)
+    ordering = ('-submitted_at', '-id')
+    sortable_by = ('id', 'submitted_at')  # the indexed orderings
+    autocomplete_fields = ('engineer', 'team_members')
+    readonly_fields = ('submitted_at', 'submitted_on', 'duration_seconds', 'updated_at')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(InventoryItem)
+class InventoryItemAdmin(admin.ModelAdmin):
+    list_display = ('number', 'item', 'quantity', 'price', 'balance')
+    search_fields = ('item',)
+    ordering = ('number',)
+    actions = ('clear_stock',)
+
+    @admin.action(description="Take all stock of the selected items", permissions=('change',))
+    def clear_stock(self, request, queryset):
+        # Locked until the TAKEs commit, so stock added meanwhile is taken too, not left behind
+        with transaction.atomic():
+            movements = [
+                (pk, 'TAKE', quantity)
+                for pk, quantity in queryset.select_for_update().filter(quantity__gt=0).values_list('pk', 'quantity')
+            ]
+            apply_movements(movements, user=request.user)
+        self.message_user(request, f"Cleared the stock of {len(movements)} items.", messages.SUCCESS)
+
+
+@admin.register(InventoryTransaction)
+class InventoryTransactionAdmin(admin.ModelAdmin):
+    list_display = ('at', 'item', 'action', 'quantity', 'performed_by')
+    list_filter = ('action',)
+    list_select_related = ('item', 'performed_by')
+    search_fields = ('item__item',)
+    ordering = ('-at', '-id')
+    autocomplete_fields = ('item', 'performed_by')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ('reverse_movements',)
+
+    # The transaction log records stock changes made through apply_movements(); editing a
+    # row here would not move any stock, so rows are only created by reversing them
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_move_stock_permission(self, request):
+        return request.user.has_perm('reports.change_inventoryitem')
+
+    # Movements are logged with the quantity actually moved, so a reversal never makes stock up
+    @admin.action(description="Reverse the selected movements", permissions=('move_stock',))
+    def reverse_movements(self, request, queryset):
+        opposite = {'TAKE': 'ADD', 'ADD': 'TAKE'}
+        movements = [
+            (item_id, opposite[action], quantity)
+            for item_id, action, quantity in queryset.order_by('at', 'id').values_list('item_id', 'action', 'quantity')
+        ]
+        apply_movements(movements, user=request.user)
+        self.message_user(request, f"Reversed {len(movements)} movements.", messages.SUCCESS)
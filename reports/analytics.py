@@ -0,0 +1,60 @@
+from django.db import connection
+
+# Dimensions repair times can be grouped by, as TaskSubmission columns
+DIMENSIONS = ('equipment_type', 'location', 'shift')
+
+
+def repair_time_stats(dimension, date_from=None, date_to=None):
+    """Task count and mean/median/p90 repair time per value of ``dimension``, computed in SQL.
+
+    Repair time is ``duration_seconds``; tasks without one count towards
+    ``tasks`` only. Percentiles are nearest-rank, picked with window
+    functions, so this is one query on SQLite and PostgreSQL alike. Rows are
+    dicts, busiest group first.
+    """
+    if dimension not in DIMENSIONS:
+        raise ValueError(f"Unknown dimension: {dimension}")
+    column = connection.ops.quote_name(dimension)
+    where, params = '', []
+    if date_from and date_to:
+        where, params = 'WHERE submitted_on BETWEEN %s AND %s', [date_from, date_to]
+
+    sql = f"""
+        WITH ranked AS (
+            SELECT {column} AS grp, duration_seconds AS s,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY {column}, CASE WHEN duration_seconds IS NULL THEN 1 ELSE 0 END
+                       ORDER BY duration_seconds
+                   ) AS rn,
+                   COUNT(duration_seconds) OVER (PARTITION BY {column}) AS timed
+            FROM reports_tasksubmission
+            {where}
+        )
+        SELECT grp, COUNT(*), COUNT(s), AVG(s),
+               MAX(CASE WHEN s IS NOT NULL AND rn = (timed * 50 + 99) / 100 THEN s END),
+               MAX(CASE WHEN s IS NOT NULL AND rn = (timed * 90 + 99) / 100 THEN s END)
+        FROM ranked
+        GROUP BY grp
+        ORDER BY COUNT(*) DESC, grp
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [
+            {
+                dimension: grp or '',
+                'tasks': tasks,
+                'timed': timed,
+                'mean_seconds': float(mean) if mean is not None else None,
+                'median_seconds': median,
+                'p90_seconds': p90,
+            }
+            for grp, tasks, timed, mean, median, p90 in cursor.fetchall()
+        ]
+
+
+def format_duration(seconds):
+    """``H:MM`` for a number of seconds, or an empty string."""
+    if seconds is None:
+        return ''
+    minutes = int(round(seconds / 60))
+    return f"{minutes // 60}:{minutes % 60:02d}"
@@ -0,0 +1,92 @@
+import hashlib
+
+from django.db.models import Prefetch
+from django.utils.dateparse import parse_date
+
+from .models import DataVersion, Engineer, TaskSubmission
+
+# Fields the task API can return; ``engineer`` and ``team_members`` are embedded objects
+TASK_API_FIELDS = (
+    'id', 'engineer', 'date', 'shift', 'reporter', 'location', 'equipment_type', 'task_type',
+    'description', 'cause_of_problem', 'corrective_measure', 'start_time', 'end_time', 'time_taken',
+    'duration_seconds', 'status', 'remark', 'submitted_at', 'team_members',
+)
+API_PAGE_SIZE = 100
+API_MAX_PAGE_SIZE = 1000
+
+
+class APIError(ValueError):
+    pass
+
+
+def parse_fields(value):
+    """Requested field names in API order; all of them when ``value`` is empty."""
+    if not value:
+        return list(TASK_API_FIELDS)
+    requested = {name.strip() for name in value.split(',') if name.strip()}
+    unknown = requested.difference(TASK_API_FIELDS)
+    if unknown:
+        raise APIError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return [name for name in TASK_API_FIELDS if name in requested]
+
+
+def filtered_tasks(params):
+    """TaskSubmission queryset for the API's date_from/date_to, et_id and task_type filters."""
+    tasks = TaskSubmission.objects.all()
+    for param, lookup in (('date_from', 'submitted_on__gte'), ('date_to', 'submitted_on__lte')):
+        if params.get(param):
+            try:
+                day = parse_date(params[param])
+            except ValueError:
+                day = None
+            if day is None:
+                raise APIError(f"{param} must be a YYYY-MM-DD date")
+            tasks = tasks.filter(**{lookup: day})
+    if params.get('et_id'):
+        tasks = tasks.filter(engineer__et_id=params['et_id'])
+    if params.get('task_type'):
+        task_types = params['task_type'].split(',')
+        if not set(task_types) <= set(dict(TaskSubmission.TASK_TYPES)):
+            raise APIError("task_type must be a comma-separated list of PM, RT, MT")
+        tasks = tasks.filter(task_type__in=task_types)
+    return tasks
+
+
+def select_fields(tasks, fields):
+    """Load only the columns ``fields`` need, with one prefetch for team members."""
+    columns = {'id', 'submitted_at'}  # always needed for the cursor
+    for name in fields:
+        if name == 'engineer':
+            tasks = tasks.select_related('engineer')
+            columns.update({'engineer__et_id', 'engineer__name'})
+        elif name != 'team_members':
+            columns.add(name)
+    if 'team_members' in fields:
+        tasks = tasks.prefetch_related(
+            Prefetch('team_members', queryset=Engineer.objects.only('id', 'et_id', 'name').order_by('id'))
+        )
+    return tasks.only(*columns)
+
+
+def _engineer(engineer):
+    return {'et_id': engineer.et_id, 'name': engineer.name}
+
+
+def serialize_task(task, fields):
+    data = {}
+    for name in fields:
+        if name == 'engineer':
+            data[name] = _engineer(task.engineer)
+        elif name == 'team_members':
+            data[name] = [_engineer(member) for member in task.team_members.all()]
+        else:
+            value = getattr(task, name)
+            data[name] = value.isoformat() if hasattr(value, 'isoformat') else value
+    return data
+
+
+def tasks_etag(request):
+    """ETag for a task API request: changes whenever any task data or the query does."""
+    version = DataVersion.current(DataVersion.TASKS)
+    query = sorted((key, value) for key, values in request.GET.lists() for value in values)
+    return hashlib.sha256(f"{version}|{query}".encode()).hexdigest()[:32]
@@ -0,0 +1,240 @@
+import hashlib
+import heapq
+import os
+import uuid
+from datetime import date, datetime
+from itertools import chain
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import DataVersion, Engineer, TaskArchive, TaskSubmission
+
+# Every TaskSubmission column, by attribute name, plus the team as a list of engineer ids
+ARCHIVE_FIELDS = [field.attname for field in TaskSubmission._meta.concrete_fields]
+_DATE_FIELDS = [field.attname for field in TaskSubmission._meta.concrete_fields if field.get_internal_type() == 'DateField']
+_INTEGER_FIELDS = [
+    field.attname for field in TaskSubmission._meta.concrete_fields
+    if field.get_internal_type() in ('AutoField', 'BigAutoField', 'ForeignKey', 'PositiveIntegerField')
+]
+_DELETE_BATCH = 500
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def archive_path(name):
+    return settings.TASK_ARCHIVE_DIR / name
+
+
+def _task_records(tasks):
+    """Archive records of ``tasks``: column values plus ``team_member_ids``, in id order."""
+    Membership = TaskSubmission.team_members.through
+    teams = {}
+    for task_id, engineer_id in Membership.objects.filter(tasksubmission__in=tasks).order_by('engineer_id').values_list(
+        'tasksubmission_id', 'engineer_id',
+    ):
+        teams.setdefault(task_id, []).append(engineer_id)
+    records = []
+    for record in tasks.order_by('id').values(*ARCHIVE_FIELDS).iterator(chunk_size=5000):
+        record['team_member_ids'] = teams.get(record['id'], [])
+        records.append(record)
+    return records
+
+
+def _clean(record):
+    """Turn the pandas/pyarrow values of a read record back into what the model fields hold."""
+    for field, value in record.items():
+        if hasattr(value, 'to_pydatetime'):
+            value = value.to_pydatetime()
+        if field in _DATE_FIELDS and isinstance(value, datetime):
+            value = value.date()
+        elif field == 'team_member_ids':
+            value = [int(pk) for pk in value] if value is not None else []
+        record[field] = value
+    return record
+
+
+def _read_records(name):
+    import pandas as pd
+
+    frame = pd.read_parquet(archive_path(name))
+    return [_clean(record) for record in frame.astype(object).where(frame.notna(), None).to_dict('records')]
+
+
+def _write_records(records, month):
+    """Write ``records`` to a new zstd-compressed Parquet file; returns ``(name, sha256)``."""
+    import pandas as pd
+
+    directory = settings.TASK_ARCHIVE_DIR
+    directory.mkdir(parents=True, exist_ok=True)
+    # A new name per write: the manifest keeps pointing at the old file until the move commits
+    name = f"tasks-{month:%Y-%m}-{uuid.uuid4().hex[:8]}.parquet"
+    frame = pd.DataFrame.from_records(records, columns=ARCHIVE_FIELDS + ['team_member_ids'])
+    for field in _DATE_FIELDS:
+        frame[field] = pd.to_datetime(frame[field]).dt.date  # stored as Parquet dates
+    for field in _INTEGER_FIELDS:
+        frame[field] = frame[field].astype('Int64')  # nullable, so NULLs do not turn into floats
+    temporary = directory / f".{name}.tmp"
+    frame.to_parquet(temporary, engine='pyarrow', compression='zstd', index=False)
+    with open(temporary, 'rb') as f:
+        digest = hashlib.file_digest(f, 'sha256').hexdigest()
+        os.fsync(f.fileno())
+    os.replace(temporary, directory / name)
+    return name, digest
+
+
+def _delete_tasks(ids):
+    # Archived tasks are moved, not deleted: a raw DELETE keeps the post_delete receivers from
+    # writing change-feed tombstones and taking them out of the daily rollup counts
+    Membership = TaskSubmission.team_members.through
+    table = connection.ops.quote_name(TaskSubmission._meta.db_table)
+    with connection.cursor() as cursor:
+        for start in range(0, len(ids), _DELETE_BATCH):
+            batch = ids[start:start + _DELETE_BATCH]
+            Membership.objects.filter(tasksubmission_id__in=batch).delete()
+            cursor.execute(f"DELETE FROM {table} WHERE id IN ({', '.join(['%s'] * len(batch))})", batch)
+
+
+def archive_month(month):
+    """Move the tasks submitted in ``month`` into its Parquet file; returns how many moved.
+
+    Tasks added to an already archived month are merged into a new file for
+    it. The rows are read, written out, recorded in the manifest and deleted
+    in one transaction (locking them where the database can), so an edit
+    made meanwhile cannot be lost with the delete, and an interrupted run
+    leaves every task either in the database or in the file the manifest
+    names, never both or neither.
+    """
+    tasks = TaskSubmission.objects.filter(submitted_on__gte=month, submitted_on__lt=next_month(month))
+    name = None
+    try:
+        with transaction.atomic():
+            # Edits to the month's rows wait for the move instead of landing between read and delete
+            list(tasks.select_for_update().values_list('id', flat=True))
+            records = _task_records(tasks)
+            if not records:
+                return 0
+            previous = TaskArchive.objects.select_for_update().filter(month=month).first()
+            archived = _read_records(previous.file) if previous else []
+            name, digest = _write_records(archived + records, month)
+            TaskArchive.objects.update_or_create(
+                month=month, defaults={'file': name, 'rows': len(archived) + len(records), 'sha256': digest},
+            )
+            _delete_tasks([record['id'] for record in records])
+            DataVersion.bump(DataVersion.TASKS)
+    except BaseException:
+        if name:
+            archive_path(name).unlink(missing_ok=True)
+        raise
+    if previous:
+        archive_path(previous.file).unlink(missing_ok=True)
+    return len(records)
+
+
+def archive_tasks(before, progress=None):
+    """Archive every whole month of tasks submitted before ``before``'s month.
+
+    Returns ``{month: tasks moved}``; ``progress(month, moved)`` is called
+    after each month.
+    """
+    cutoff = month_start(before)
+    moved = {}
+    for month in TaskSubmission.objects.filter(submitted_on__lt=cutoff).dates('submitted_on', 'month'):
+        moved[month] = archive_month(month)
+        if progress:
+            progress(month, moved[month])
+    return moved
+
+
+class ArchivedTasks:
+    """Archived tasks submitted in an inclusive date range, read from their month files on demand.
+
+    Only the month files the range reaches are read; without a range, all of
+    them are. Iterating yields ``(task, team_member_ids)`` a batch of rows at
+    a time. by_engineer() and by_submitted_at() yield the export orders: each
+    month is sorted on its key columns, and its rows stay Arrow columns until
+    a batch of them is yielded. Tasks are unsaved TaskSubmission instances;
+    those two also set their team's ids on them as ``team_member_ids``.
+    Tasks and team members of engineers deleted since archiving are left
+    out, as the database would have cascaded the delete. Every pass re-reads
+    the files.
+    """
+
+    batch_size = 2000
+    _KEY_COLUMNS = ['id', 'engineer_id', 'submitted_on', 'submitted_at', 'team_member_ids']
+
+    def __init__(self, date_from=None, date_to=None):
+        self.date_from, self.date_to = date_from, date_to
+        months = TaskArchive.objects.order_by('month')
+        if date_from and date_to:
+            months = months.filter(month__gte=month_start(date_from), month__lte=date_to)
+        self.files = list(months.values_list('file', flat=True))
+        self.engineer_ids = set(Engineer.objects.values_list('pk', flat=True)) if self.files else set()
+
+    def _included(self, record):
+        if self.date_from and self.date_to and not self.date_from <= record['submitted_on'] <= self.date_to:
+            return False
+        return record['engineer_id'] in self.engineer_ids
+
+    def _members(self, record):
+        return [pk for pk in record['team_member_ids'] or () if pk in self.engineer_ids]
+
+    def _entry(self, record):
+        members = self._members(record)
+        del record['team_member_ids']
+        return TaskSubmission(**record), members
+
+    def __iter__(self):
+        import pyarrow.parquet as pq
+
+        for name in self.files:
+            for batch in pq.ParquetFile(archive_path(name)).iter_batches(batch_size=self.batch_size):
+                for record in batch.to_pylist():
+                    if self._included(_clean(record)):
+                        yield self._entry(record)
+
+    def _sorted_month(self, name, keys):
+        """Yield ``(key, task)`` for one month file, for every key ``keys(record)`` gives, in key order."""
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(archive_path(name))
+        order = sorted(
+            (key, row)
+            for row, record in enumerate(table.select(self._KEY_COLUMNS).to_pylist())
+            if self._included(_clean(record))
+            for key in keys(record)
+        )
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            records = table.take([row for _, row in batch]).to_pylist()
+            for (key, _), record in zip(batch, records):
+                task, members = self._entry(_clean(record))
+                task.team_member_ids = members
+                yield key, task
+
+    def by_engineer(self):
+        """Yield ``(engineer_id, task_id, task)`` per task and participant, by engineer and then task id."""
+        def keys(record):
+            return [(pk, record['id']) for pk in sorted({record['engineer_id'], *self._members(record)})]
+
+        months = [self._sorted_month(name, keys) for name in self.files]
+        for (engineer_id, task_id), task in heapq.merge(*months, key=itemgetter(0)):
+            yield engineer_id, task_id, task
+
+    def by_submitted_at(self):
+        """Yield tasks by submission time and then id."""
+        # Months follow each other in submission time, so they only need chaining
+        months = (self._sorted_month(name, lambda record: [(record['submitted_at'], record['id'])]) for name in self.files)
+        return (task for _, task in chain.from_iterable(months))
+
+
+def archived_tasks(date_from=None, date_to=None):
+    """The ArchivedTasks submitted in an inclusive date range."""
+    return ArchivedTasks(date_from, date_to)
@@ -0,0 +1,203 @@
+import random
+import shutil
+import statistics
+import time
+import tracemalloc
+from datetime import datetime, time as dt_time, timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Engineer, InventoryItem, TaskSubmission
+from .submissions import bulk_create_tasks
+
+BENCH_PASSWORD = 'bench'
+LEADER_USERNAME = 'bench_leader'
+# Run in this order; submit_tasks writes, so it goes last
+SCENARIOS = ('dashboard', 'export_excel', 'export_pdf', 'download_inventory', 'submit_tasks')
+
+_LOCATIONS = ['Bole', 'Piassa', 'Megenagna', 'Merkato', 'CMC', 'Ayat', 'Kality', 'Gerji']
+_EQUIPMENT = ['Router', 'Switch', 'BTS', 'Rectifier', 'Generator', 'Fiber', 'OLT', 'Battery']
+_SHIFTS = ['Day', 'Night']
+_STATUSES = ['Completed', 'Pending', 'In progress']
+_WORDS = (
+    'link down power failure replaced module restored alarm cleared fiber cut spliced '
+    'battery low charged rectifier fault reset config updated port flapping cable'
+).split()
+
+
+def _text(rng, words):
+    return ' '.join(rng.choice(_WORDS) for _ in range(words))
+
+
+def seed(engineers=50, tasks=10_000, inventory_items=500, days=365, max_team=3, random_seed=42, batch_size=5000):
+    """Fill an empty database with reproducible synthetic data; returns the counts created.
+
+    The same arguments always produce the same rows. Tasks go through
+    bulk_create_tasks() in batches, so rollups and the data version are kept
+    as the application would keep them.
+    """
+    rng = random.Random(random_seed)
+    users = User.objects.bulk_create(
+        [User(username=LEADER_USERNAME)] + [User(username=f'bench_eng_{i}') for i in range(engineers)]
+    )
+    leader = users[0]
+    leader.set_password(BENCH_PASSWORD)
+    leader.save(update_fields=['password'])
+    staff = Engineer.objects.bulk_create(
+        [Engineer(user=leader, et_id='L0001', name='Bench Leader', is_team_leader=True)]
+        + [Engineer(user=user, et_id=f'{i:05d}', name=f'Engineer {i}') for i, user in enumerate(users[1:])]
+    )
+    engineer_ids = [engineer.pk for engineer in staff[1:]]
+
+    end = timezone.now()
+    links = 0
+    for start in range(0, tasks, batch_size):
+        entries = []
+        for _ in range(min(batch_size, tasks - start)):
+            submitted_at = end - timedelta(seconds=rng.randrange(days * 86400))
+            started = submitted_at - timedelta(minutes=rng.randrange(30, 600))
+            members = rng.sample(engineer_ids, rng.randint(0, min(max_team, len(engineer_ids))))
+            links += len(members)
+            entries.append((TaskSubmission(
+                engineer_id=rng.choice(engineer_ids),
+                date=timezone.localdate(submitted_at),
+                shift=rng.choice(_SHIFTS),
+                location=rng.choice(_LOCATIONS),
+                equipment_type=rng.choice(_EQUIPMENT),
+                task_type=rng.choice(['PM', 'RT', 'MT']),
+                description=_text(rng, 12),
+                cause_of_problem=_text(rng, 6),
+                corrective_measure=_text(rng, 8),
+                start_time=started,
+                end_time=submitted_at,
+                status=rng.choice(_STATUSES),
+                remark=_text(rng, 4),
+                submitted_at=submitted_at,
+            ), members))
+        bulk_create_tasks(entries, batch_size=1000)
+
+    InventoryItem.objects.bulk_create(
+        [InventoryItem(item=f'Part {i}', quantity=rng.randrange(200), price=rng.randrange(10, 5000))
+         for i in range(inventory_items)],
+        batch_size=1000,
+    )
+    return {'engineers': engineers, 'tasks': tasks, 'team_links': links, 'inventory_items': inventory_items}
+
+
+def _submission_payload(forms=5):
+    today = timezone.localdate()
+    start = timezone.make_aware(datetime.combine(today, dt_time(8, 0)))
+    member = Engineer.objects.filter(is_team_leader=False).order_by('id').values_list('pk', flat=True).first()
+    data = {
+        'form-TOTAL_FORMS': str(forms), 'form-INITIAL_FORMS': '0',
+        'form-MIN_NUM_FORMS': '0', 'form-MAX_NUM_FORMS': '1000',
+    }
+    for i in range(forms):
+        prefix = f'form-{i}-'
+        data.update({
+            prefix + 'date': today.isoformat(), prefix + 'shift': 'Day', prefix + 'reporter': '',
+            prefix + 'location': 'Bole', prefix + 'equipment_type': 'Router', prefix + 'task_type': 'PM',
+            prefix + 'description': 'Benchmark task', prefix + 'status': 'Completed',
+            prefix + 'start_time': start.strftime('%Y-%m-%d %H:%M'),
+            prefix + 'end_time': (start + timedelta(hours=1)).strftime('%Y-%m-%d %H:%M'),
+        })
+        if member:
+            data[prefix + 'team_members'] = [str(member)]
+    return data
+
+
+def scenarios():
+    """``name -> callable(client)`` for each of SCENARIOS."""
+    payload = _submission_payload()
+    return {
+        'dashboard': lambda client: client.get(reverse('reports:dashboard'), secure=True),
+        'export_excel': lambda client: client.get(reverse('reports:export_excel'), secure=True),
+        'export_pdf': lambda client: client.get(reverse('reports:export_pdf'), secure=True),
+        'download_inventory': lambda client: client.get(reverse('reports:download_inventory'), secure=True),
+        'submit_tasks': lambda client: client.post(reverse('reports:submit_tasks'), payload, secure=True),
+    }
+
+
+def _consume(response):
+    if response.streaming:
+        size = 0
+        for chunk in response.streaming_content:
+            size += len(chunk)
+        response.close()
+        return size
+    return len(response.content)
+
+
+def run(names=None, repeat=3, cache_dir=None):
+    """Time each scenario through the test client; returns ``name -> result dict``.
+
+    Wall time is the median of ``repeat`` plain runs. One more run under
+    tracemalloc and query capture gives peak Python memory and the query
+    count, so their overhead never leaks into the timings. Exports are
+    measured cold: ``cache_dir`` (the export cache) is emptied before each run.
+    """
+    client = Client()
+    if not client.login(username=LEADER_USERNAME, password=BENCH_PASSWORD):
+        raise RuntimeError("The benchmark user is missing; seed the database first.")
+
+    def call(name, request):
+        if cache_dir and name.startswith('export_'):
+            shutil.rmtree(cache_dir, ignore_errors=True)
+        response = request(client)
+        size = _consume(response)
+        if response.status_code >= 400:
+            raise RuntimeError(f"{name} returned HTTP {response.status_code}")
+        return response.status_code, size
+
+    results = {}
+    for name, request in scenarios().items():
+        if names and name not in names:
+            continue
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            status, size = call(name, request)
+            timings.append(time.perf_counter() - started)
+
+        tracemalloc.start()
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                call(name, request)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        results[name] = {
+            'wall_seconds': statistics.median(timings),
+            'runs': timings,
+            'queries': len(queries),
+            'peak_memory_bytes': peak,
+            'response_bytes': size,
+            'status': status,
+        }
+    return results
+
+
+def compare(previous, current, threshold=0.2):
+    """Regressions of ``current`` against ``previous`` results, as human-readable lines.
+
+    A scenario regresses when its median wall time or peak memory grows by
+    more than ``threshold`` (a fraction), or when it runs more queries.
+    """
+    regressions = []
+    for name, now in current['results'].items():
+        before = previous.get('results', {}).get(name)
+        if before is None:
+            continue
+        for key, unit in (('wall_seconds', 's'), ('peak_memory_bytes', ' B')):
+            if before[key] and now[key] > before[key] * (1 + threshold):
+                change = (now[key] - before[key]) / before[key]
+                regressions.append(f"{name}: {key} {before[key]:.4g}{unit} -> {now[key]:.4g}{unit} (+{change:.0%})")
+        if now['queries'] > before['queries']:
+            regressions.append(f"{name}: queries {before['queries']} -> {now['queries']}")
+    return regressions
@@ -0,0 +1,100 @@
+import base64
+import binascii
+import heapq
+import json
+from datetime import timedelta
+
+from django.db.models import Prefetch, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .api import TASK_API_FIELDS, serialize_task
+from .models import Engineer, TaskSubmission, TaskTombstone
+
+# Rows newer than this are left for the next read, so a transaction that
+# commits a slightly older timestamp after we read cannot be skipped
+CHANGE_FEED_LAG = timedelta(seconds=5)
+
+# Position of each stream in the feed order (timestamp, stream, id)
+_UPSERT, _DELETE = 0, 1
+
+
+def encode_watermark(position):
+    changed_at, stream, pk = position
+    raw = f"{changed_at.isoformat()}|{stream}|{pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_watermark(watermark):
+    """Return ``(changed_at, stream, id)`` for a watermark, None for an empty one.
+
+    Raises ValueError for a malformed watermark, which a sync client must
+    not silently replace with a full resync.
+    """
+    if not watermark:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(watermark + '=' * (-len(watermark) % 4)).decode()
+        changed_at, stream, pk = raw.split('|')
+        changed_at = parse_datetime(changed_at)
+        stream, pk = int(stream), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        changed_at = None
+    if changed_at is None:
+        raise ValueError("Malformed watermark")
+    return changed_at, stream, pk
+
+
+def _after(queryset, time_field, stream, position):
+    if position is None:
+        return queryset
+    changed_at, after_stream, pk = position
+    later = Q(**{f'{time_field}__gt': changed_at})
+    if stream > after_stream:
+        later |= Q(**{time_field: changed_at})
+    elif stream == after_stream:
+        later |= Q(**{time_field: changed_at, 'id__gt': pk})
+    return queryset.filter(later)
+
+
+def _upserts(position, until, chunk_size):
+    tasks = _after(TaskSubmission.objects.filter(updated_at__lt=until), 'updated_at', _UPSERT, position)
+    tasks = tasks.select_related('engineer').prefetch_related(
+        Prefetch('team_members', queryset=Engineer.objects.only('id', 'et_id', 'name').order_by('id'))
+    ).order_by('updated_at', 'id')
+    for task in tasks.iterator(chunk_size=chunk_size):
+        yield (task.updated_at, _UPSERT, task.pk), task
+
+
+def _deletes(position, until, chunk_size):
+    tombstones = _after(TaskTombstone.objects.filter(deleted_at__lt=until), 'deleted_at', _DELETE, position)
+    for tombstone in tombstones.order_by('deleted_at', 'id').iterator(chunk_size=chunk_size):
+        yield (tombstone.deleted_at, _DELETE, tombstone.pk), tombstone
+
+
+def changes(watermark=None, limit=None, chunk_size=1000):
+    """Yield NDJSON lines for every task change after ``watermark``, oldest first.
+
+    Saved tasks are ``{"op": "upsert", "task": {...}}`` and deleted ones
+    ``{"op": "delete", "id": ...}``, each with the watermark to resume
+    after it. Both streams are read in (time, id) order from their indexes
+    and merged, so the cost follows the number of changes, not the table
+    size. The last line is ``{"op": "end", "watermark": ...}``: pass that
+    watermark next time (it is the given one if nothing changed).
+    """
+    position = decode_watermark(watermark)
+    until = timezone.now() - CHANGE_FEED_LAG
+    merged = heapq.merge(_upserts(position, until, chunk_size), _deletes(position, until, chunk_size),
+                         key=lambda entry: entry[0])
+    emitted = 0
+    for position_after, row in merged:
+        if limit is not None and emitted >= limit:
+            break
+        watermark = encode_watermark(position_after)
+        if position_after[1] == _UPSERT:
+            line = {'op': 'upsert', 'task': serialize_task(row, TASK_API_FIELDS), 'watermark': watermark}
+        else:
+            line = {'op': 'delete', 'id': row.task_id, 'deleted_at': row.deleted_at.isoformat(), 'watermark': watermark}
+        emitted += 1
+        yield json.dumps(line) + '\n'
+    yield json.dumps({'op': 'end', 'watermark': watermark}) + '\n'
@@ -0,0 +1,85 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+
+from . import rollups
+from .metrics import cache_metrics
+from .models import DataVersion, TaskSubmission
+
+
+def versioned(name, version, build, *parts):
+    """Return the cached value for ``name``/``parts`` at ``version``, building it on a miss.
+
+    Saves and deletes of tasks bump the version, so old entries are simply
+    never asked for again and expire on their own; nothing is invalidated.
+    """
+    key = _key(name, version, parts)
+    value = cache.get(key)
+    cache_metrics.record(f'dashboard_{name}', value is not None)
+    if value is None:
+        value = build()
+        cache.set(key, value, settings.DASHBOARD_CACHE_TIMEOUT)
+    return value
+
+
+async def aversioned(name, version, build, *parts):
+    """versioned() for async views; ``build`` is a coroutine function."""
+    key = _key(name, version, parts)
+    value = await cache.aget(key)
+    cache_metrics.record(f'dashboard_{name}', value is not None)
+    if value is None:
+        value = await build()
+        await cache.aset(key, value, settings.DASHBOARD_CACHE_TIMEOUT)
+    return value
+
+
+def _key(name, version, parts):
+    return ':'.join(['dashboard', name, f'v{version}', *(str(part) for part in parts)])
+
+
+def _dates_queryset():
+    return TaskSubmission.objects.order_by('-submitted_on').values_list('submitted_on', flat=True).distinct()
+
+
+def submission_dates(version):
+    """Distinct submission dates, newest first."""
+    return versioned('dates', version, lambda: list(_dates_queryset()))
+
+
+async def asubmission_dates(version):
+    async def build():
+        return [day async for day in _dates_queryset()]
+    return await aversioned('dates', version, build)
+
+
+def summary_table(version, day=None):
+    """Rendered PM/RT/MT/total table for ``day`` (or all time)."""
+    return versioned('summary', version, lambda: render_to_string(
+        'dashboard_summary.html', {'engineer_summary': rollups.engineer_summary(day)},
+    ), day or 'all')
+
+
+async def asummary_table(version, day=None):
+    async def build():
+        rows = [row async for row in rollups.engineer_summary(day)]
+        return render_to_string('dashboard_summary.html', {'engineer_summary': rows})
+    return await aversioned('summary', version, build, day or 'all')
+
+
+def current_version():
+    return DataVersion.current(DataVersion.TASKS)
+
+
+async def acurrent_version():
+    return await DataVersion.acurrent(DataVersion.TASKS)
+
+
+def filter_choices(version):
+    """Distinct non-empty equipment types and locations, for the search filters."""
+    def build():
+        tasks = TaskSubmission.objects.order_by()
+        return {
+            field: sorted(tasks.exclude(**{field: ''}).values_list(field, flat=True).distinct())
+            for field in ('equipment_type', 'location')
+        }
+    return versioned('filters', version, build)
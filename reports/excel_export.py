@@ -0,0 +1,203 @@
+import heapq
+from itertools import groupby
+from operator import itemgetter
+
+from django.db.models import Max
+from django.db.models.functions import Length
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+from openpyxl.utils import get_column_letter
+
+from .exports import TASK_COLUMNS, task_row
+from .models import Engineer, TaskSubmission
+
+ET_GREEN = "008751"
+ET_YELLOW = "FFC107"
+
+# Hidden columns after TASK_COLUMNS, for import_tasks to put the tasks back together: the
+# task's own engineer, its type and, on that engineer's sheet, its team as ET IDs
+OWNER_HEADERS = ['et_id', 'task_type', 'team_members']
+
+# Fixed rendered lengths for non-text columns ("YYYY-MM-DD" / "YYYY-MM-DD HH:MM:SS")
+_FIXED_WIDTHS = {'date': 10, 'start_time': 19, 'end_time': 19}
+
+
+def _text_fields():
+    return [field for _, field in TASK_COLUMNS if field not in _FIXED_WIDTHS]
+
+
+def column_widths(longest, fallback_reporter=''):
+    """Width of every export column from the longest value of each text field.
+
+    Write-only worksheets emit ``<cols>`` before any row, so widths have to be
+    known up front; ``longest`` comes from a ``Max(Length())`` aggregate
+    rather than a second pass over the rows.
+    """
+    longest = dict(longest, reporter=max(longest.get('reporter') or 0, len(fallback_reporter)))
+    widths = []
+    for header, field in TASK_COLUMNS:
+        length = max(len(header), _FIXED_WIDTHS.get(field) or longest.get(field) or 0)
+        widths.append(min(length + 6, 120))
+    return widths
+
+
+def longest_values_by_engineer(tasks):
+    """Map engineer id -> longest value per text field over the tasks they took part in.
+
+    Two grouped aggregates (primary engineer and team members) regardless of
+    how many engineers are involved.
+    """
+    through = TaskSubmission.team_members.through
+    primary = tasks.order_by().values('engineer_id').annotate(
+        **{field: Max(Length(field)) for field in _text_fields()}
+    )
+    members = through.objects.filter(tasksubmission__in=tasks).order_by().values('engineer_id').annotate(
+        **{field: Max(Length(f'tasksubmission__{field}')) for field in _text_fields()}
+    )
+    longest = {}
+    for row in list(primary) + list(members):
+        current = longest.setdefault(row.pop('engineer_id'), {})
+        for field, length in row.items():
+            current[field] = max(current.get(field) or 0, length or 0)
+    return longest
+
+
+def add_archived_lengths(longest, archived=None):
+    """Fold the text lengths of the ArchivedTasks ``archived`` into ``longest``."""
+    for task, member_ids in archived or ():
+        lengths = {field: len(getattr(task, field) or '') for field in _text_fields()}
+        for engineer_id in {task.engineer_id, *member_ids}:
+            current = longest.setdefault(engineer_id, {})
+            for field, length in lengths.items():
+                current[field] = max(current.get(field) or 0, length)
+    return longest
+
+
+def _with_team_member_ids(primary, links):
+    """Set ``team_member_ids`` on the tasks of ``(engineer_id, task_id, task)`` items, passing them on.
+
+    ``links`` yields ``(engineer_id, task_id, member_id)`` in the same order
+    as ``primary``, so the two are walked in step.
+    """
+    links = iter(links)
+    link = next(links, None)
+    for engineer_id, task_id, task in primary:
+        task.team_member_ids = []
+        while link is not None and link[:2] <= (engineer_id, task_id):
+            if link[:2] == (engineer_id, task_id):
+                task.team_member_ids.append(link[2])
+            link = next(links, None)
+        yield engineer_id, task_id, task
+
+
+def participations(tasks, chunk_size=2000, archived=None):
+    """Yield ``(engineer_id, task)`` for each task and each of its participants.
+
+    Ordered by engineer and then task id, built from ordered task and
+    through-table queries merged in Python, so every engineer's rows arrive
+    contiguously and each task appears once per engineer. A task yielded for
+    its own engineer carries its team's ids in ``team_member_ids``.
+    The tasks of the ArchivedTasks ``archived`` are merged in as well.
+    """
+    through = TaskSubmission.team_members.through
+    primary = _with_team_member_ids(
+        ((task.engineer_id, task.id, task) for task in tasks.order_by('engineer_id', 'id').iterator(chunk_size=chunk_size)),
+        through.objects.filter(tasksubmission__in=tasks)
+        .order_by('tasksubmission__engineer_id', 'tasksubmission_id', 'engineer_id')
+        .values_list('tasksubmission__engineer_id', 'tasksubmission_id', 'engineer_id')
+        .iterator(chunk_size=chunk_size),
+    )
+    members = (
+        (link.engineer_id, link.tasksubmission_id, link.tasksubmission)
+        for link in through.objects.filter(tasksubmission__in=tasks)
+        .select_related('tasksubmission')
+        .order_by('engineer_id', 'tasksubmission_id')
+        .iterator(chunk_size=chunk_size)
+    )
+    moved = archived.by_engineer() if archived is not None else ()
+    last = None
+    for engineer_id, task_id, task in heapq.merge(primary, members, moved, key=lambda p: p[:2]):
+        if (engineer_id, task_id) != last:
+            last = (engineer_id, task_id)
+            yield engineer_id, task
+
+
+def _owner_values(task, engineer_id, engineers):
+    team = task.team_member_ids if task.engineer_id == engineer_id else ()
+    return [engineers[task.engineer_id].et_id, task.task_type, ','.join(engineers[pk].et_id for pk in team)]
+
+
+def _add_named_styles(wb):
+    thin = Side(border_style="thin", color="000000")
+    border = Border(left=thin, right=thin, top=thin, bottom=thin)
+    wrap = Alignment(vertical="center", wrap_text=True, shrink_to_fit=True)
+
+    wb.add_named_style(NamedStyle(
+        name='et_title',
+        font=Font(bold=True, color="000000", size=14),
+        fill=PatternFill(start_color=ET_YELLOW, end_color=ET_YELLOW, fill_type="solid"),
+        alignment=Alignment(horizontal="center", vertical="center"),
+    ))
+    wb.add_named_style(NamedStyle(
+        name='et_header',
+        font=Font(bold=True, color="FFFFFF"),
+        fill=PatternFill(start_color=ET_GREEN, end_color=ET_GREEN, fill_type="solid"),
+        border=border,
+        alignment=wrap,
+    ))
+    wb.add_named_style(NamedStyle(name='et_cell', border=border, alignment=wrap))
+    wb.add_named_style(NamedStyle(
+        name='et_cell_alt',
+        fill=PatternFill(start_color="F5F5F5", end_color="F5F5F5", fill_type="solid"),
+        border=border,
+        alignment=wrap,
+    ))
+
+
+def _styled(ws, value, style):
+    # Style first so date values still pick up a date number format
+    cell = WriteOnlyCell(ws)
+    cell.style = style
+    cell.value = value
+    return cell
+
+
+def _write_engineer_sheet(wb, engineer, rows, widths):
+    ws = wb.create_sheet(title=f"{engineer.et_id}"[:31])
+    for col, width in enumerate(widths, 1):
+        ws.column_dimensions[get_column_letter(col)].width = width
+    for col in range(len(widths) + 1, len(widths) + len(OWNER_HEADERS) + 1):
+        ws.column_dimensions[get_column_letter(col)].hidden = True
+    ws.merged_cells.add(f"A1:{get_column_letter(len(TASK_COLUMNS))}1")
+
+    ws.append([_styled(ws, f"Ethiopian Airlines - Engineer {engineer.name} ({engineer.et_id})", 'et_title')])
+    ws.append([_styled(ws, header, 'et_header') for header in [header for header, _ in TASK_COLUMNS] + OWNER_HEADERS])
+    for index, row in enumerate(rows):
+        style = 'et_cell_alt' if index % 2 == 0 else 'et_cell'
+        ws.append([_styled(ws, value, style) for value in row])
+    # Flush the sheet's temp file now rather than keeping one open per engineer
+    ws.close()
+
+
+def write_tasks_workbook(tasks, fileobj, archived=None):
+    """Write one sheet per engineer for ``tasks`` into ``fileobj``.
+
+    Uses an openpyxl write-only workbook with shared named styles, so rows
+    are serialised as they are produced instead of being held in memory.
+    The ArchivedTasks ``archived``, streamed from the task archive, are
+    written along with ``tasks``.
+    """
+    wb = Workbook(write_only=True)
+    _add_named_styles(wb)
+
+    longest = add_archived_lengths(longest_values_by_engineer(tasks), archived)
+    engineers = Engineer.objects.in_bulk(longest.keys())
+    for engineer_id, group in groupby(participations(tasks, archived=archived), key=itemgetter(0)):
+        engineer = engineers[engineer_id]
+        rows = (task_row(task, engineer.name) + _owner_values(task, engineer_id, engineers) for _, task in group)
+        _write_engineer_sheet(wb, engineer, rows, column_widths(longest[engineer_id], engineer.name))
+
+    if not wb.worksheets:
+        wb.create_sheet(title='Sheet1')
+    wb.save(fileobj)
@@ -0,0 +1,76 @@
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+
+from .exports import get_export_backend, render_export
+from .models import DataVersion
+
+
+def _cache_dir():
+    path = Path(settings.EXPORT_CACHE_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def cache_key(kind, date_from, date_to, version):
+    raw = f"{kind}|{date_from or ''}|{date_to or ''}|{version}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def cached_export_path(kind, date_from, date_to):
+    """Path to the rendered ``kind`` export for the range at the current data version.
+
+    Artifacts are named after a hash of (kind, date_from, date_to, data
+    version). Any change to tasks bumps the version, so stale files are never
+    served and just age out of the LRU.
+    """
+    version = DataVersion.current(DataVersion.TASKS)
+    suffix = Path(get_export_backend(kind).filename).suffix
+    path = _cache_dir() / f"{cache_key(kind, date_from, date_to, version)}{suffix}"
+    try:
+        os.utime(path)  # mark as recently used
+        return path
+    except FileNotFoundError:
+        pass
+
+    # Render next to the final path and rename, so readers never see a partial file
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w+b') as output:
+            render_export(kind, date_from, date_to, output)
+        os.replace(tmp_name, path)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+    evict(keep=path)
+    return path
+
+
+def evict(keep=None, max_bytes=None):
+    """Delete least recently used artifacts until the cache fits in ``EXPORT_CACHE_MAX_BYTES``."""
+    if max_bytes is None:
+        max_bytes = settings.EXPORT_CACHE_MAX_BYTES
+    entries = []
+    for entry in os.scandir(_cache_dir()):
+        if entry.is_file() and not entry.name.endswith('.tmp'):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if keep is not None and path == str(keep):
+            continue
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def render_to_cache(kind, date_from, date_to):
+    """cached_export_path() as a string; the entry point export pool workers run."""
+    return str(cached_export_path(kind, date_from, date_to))
@@ -0,0 +1,100 @@
+from collections import namedtuple
+from datetime import datetime
+
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .archive import archived_tasks
+from .models import TaskSubmission
+
+EXCEL_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+PDF_CONTENT_TYPE = 'application/pdf'
+
+ExportBackend = namedtuple('ExportBackend', ['writer', 'filename', 'content_type'])
+
+# Writers are dotted paths imported on first use, so openpyxl, WeasyPrint and
+# friends are only loaded by processes that actually render an export
+EXPORT_BACKENDS = {
+    'excel': ExportBackend('reports.excel_export.write_tasks_workbook', 'tasks_by_engineer.xlsx', EXCEL_CONTENT_TYPE),
+    'pdf': ExportBackend('reports.pdf_export.write_tasks_pdf', 'task_summary.pdf', PDF_CONTENT_TYPE),
+}
+
+# Column header -> TaskSubmission field, in the order the Excel export writes them
+TASK_COLUMNS = [
+    ('date', 'date'),
+    ('shift', 'shift'),
+    ('reporter', 'reporter'),
+    ('location', 'location'),
+    ('equipment_type', 'equipment_type'),
+    ('problem_description', 'description'),
+    ('cause_of_problem', 'cause_of_problem'),
+    ('corrective_action', 'corrective_measure'),
+    ('start_time', 'start_time'),
+    ('end_time', 'end_time'),
+    ('time_taken', 'time_taken'),
+    ('status', 'status'),
+    ('remark', 'remark'),
+]
+
+
+def get_export_backend(kind):
+    try:
+        return EXPORT_BACKENDS[kind]
+    except KeyError:
+        raise ValueError(f"Unknown export kind: {kind}")
+
+
+def parse_date_range(date_from, date_to):
+    """Parse two ``YYYY-MM-DD`` strings into dates.
+
+    Returns ``(None, None)`` unless both are present and valid, in which case
+    the exports are not filtered by date, as they always were.
+    """
+    if date_from and date_to:
+        try:
+            return datetime.strptime(date_from, '%Y-%m-%d').date(), datetime.strptime(date_to, '%Y-%m-%d').date()
+        except ValueError:
+            pass
+    return None, None
+
+
+def filter_by_date_range(tasks, date_from, date_to):
+    """Restrict ``tasks`` to submissions between two inclusive dates."""
+    if date_from and date_to:
+        tasks = tasks.filter(submitted_on__range=[date_from, date_to])
+    return tasks
+
+
+def _naive(value):
+    if value and timezone.is_aware(value):
+        return timezone.make_naive(value, timezone.get_default_timezone())
+    return value
+
+
+def task_row(task, fallback_reporter):
+    return [
+        task.date,
+        task.shift,
+        task.reporter or fallback_reporter,
+        task.location,
+        task.equipment_type,
+        task.description,
+        task.cause_of_problem,
+        task.corrective_measure,
+        _naive(task.start_time),
+        _naive(task.end_time),
+        str(task.time_taken) if task.time_taken is not None else '',
+        task.status,
+        task.remark,
+    ]
+
+
+def render_export(kind, date_from, date_to, fileobj):
+    """Render the ``kind`` export for an inclusive date range (or everything) into ``fileobj``.
+
+    Archived months the range reaches are read from their Parquet files and
+    included, so an export does not depend on where its tasks are stored.
+    """
+    writer = import_string(get_export_backend(kind).writer)
+    tasks = filter_by_date_range(TaskSubmission.objects.all(), date_from, date_to)
+    writer(tasks, fileobj, archived=archived_tasks(date_from, date_to))
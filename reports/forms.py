@@ -1,6 +1,44 @@
 from django import forms
-from django.forms import formset_factory
-from .models import TaskSubmission
+from django.core.cache import cache
+from django.forms import BaseFormSet, formset_factory
+from django.urls import reverse_lazy
+from django.utils.functional import cached_property
+from .models import DataVersion, Engineer, TaskSubmission
+
+ENGINEER_CHOICES_TIMEOUT = 60 * 60
+
+
+def engineer_choices():
+    """``[(pk, label)]`` for every engineer, cached until an engineer is saved or deleted."""
+    key = f'engineer_choices:v{DataVersion.current(DataVersion.ENGINEERS)}'
+    choices = cache.get(key)
+    if choices is None:
+        # Labels as Engineer.__str__ renders them
+        choices = [
+            (pk, f"{name} (ET-{et_id})")
+            for pk, name, et_id in Engineer.objects.order_by('name').values_list('pk', 'name', 'et_id')
+        ]
+        cache.set(key, choices, ENGINEER_CHOICES_TIMEOUT)
+    return choices
+
+
+class TeamMemberSelect(forms.SelectMultiple):
+    """Multiple select holding only the chosen engineers; the page adds more by typeahead.
+
+    Labels come from ``labels`` (pk -> label) instead of the field's
+    queryset, so rendering a row never queries or lists every engineer.
+    """
+
+    def __init__(self, attrs=None):
+        super().__init__({'data-autocomplete-url': reverse_lazy('reports:engineer_autocomplete'), **(attrs or {})})
+        self.labels = {}
+
+    def optgroups(self, name, value, attrs=None):
+        selected = [(pk, self.labels[pk]) for pk in dict.fromkeys(value) if pk in self.labels]
+        return [
+            (None, [self.create_option(name, pk, label, True, index, attrs=attrs)], index)
+            for index, (pk, label) in enumerate(selected)
+        ]
 
 class TaskSubmissionForm(forms.ModelForm):
     class Meta:
@@ -14,7 +52,7 @@ class TaskSubmissionForm(forms.ModelForm):
             'date': forms.DateInput(attrs={'type': 'date', 'required': 'required'}),
             'start_time': forms.DateTimeInput(attrs={'type': 'datetime-local', 'placeholder': 'YYYY-MM-DD HH:MM'}),
             'end_time': forms.DateTimeInput(attrs={'type': 'datetime-local', 'placeholder': 'YYYY-MM-DD HH:MM'}),
-            'team_members': forms.CheckboxSelectMultiple(),
+            'team_members': TeamMemberSelect(),
             'time_taken': forms.TextInput(attrs={'placeholder': 'e.g., 2h 30m or any text'}),
             'description': forms.Textarea(attrs={'rows': 3}),
             'cause_of_problem': forms.Textarea(attrs={'rows': 2}),
@@ -22,6 +60,13 @@ class TaskSubmissionForm(forms.ModelForm):
             'remark': forms.Textarea(attrs={'rows': 2}),
         }
 
+    def __init__(self, *args, engineer_labels=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if engineer_labels is None:
+            engineer_labels = {str(pk): label for pk, label in engineer_choices()}
+        # Submitted ids are still checked by the field, in one pk__in query
+        self.fields['team_members'].widget.labels = engineer_labels
+
     def clean(self):
         cleaned = super().clean()
         start = cleaned.get('start_time')
@@ -30,4 +75,16 @@ class TaskSubmissionForm(forms.ModelForm):
             self.add_error('end_time', 'End time must be after start time')
         return cleaned
 
-TaskSubmissionFormSet = formset_factory(TaskSubmissionForm, extra=0, can_delete=False)
\ No newline at end of file
+class BaseTaskSubmissionFormSet(BaseFormSet):
+    @cached_property
+    def engineer_labels(self):
+        return {str(pk): label for pk, label in engineer_choices()}
+
+    def get_form_kwargs(self, index):
+        # Every row shares one engineer choice list
+        return {**super().get_form_kwargs(index), 'engineer_labels': self.engineer_labels}
+
+TaskSubmissionFormSet = formset_factory(TaskSubmissionForm, formset=BaseTaskSubmissionFormSet, extra=0, can_delete=False)
+
+class InventoryUploadForm(forms.Form):
+    file = forms.FileField(help_text="The inventory workbook downloaded from the portal, with in/out filled in.")
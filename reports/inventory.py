@@ -0,0 +1,209 @@
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.functions import Greatest
+
+from .models import InventoryItem, InventoryTransaction
+
+ACTIONS = dict(InventoryTransaction.ACTION_CHOICES)
+
+
+def _compose(steps):
+    """Fold ordered TAKE/ADD steps into ``(p, q)`` with new quantity = max(quantity + p, q).
+
+    A TAKE clamps at zero and an ADD just adds, and both keep that shape, so
+    any sequence on one item becomes a single expression the database can
+    evaluate atomically against the current row value.
+    """
+    p, q = 0, 0
+    for action, amount in steps:
+        if action == "TAKE":
+            p, q = p - amount, max(q - amount, 0)
+        else:
+            p, q = p + amount, q + amount
+    return p, q
+
+
+def _effect_expression(p, q):
+    return Greatest(F("quantity") + Value(p), Value(q), output_field=IntegerField())
+
+
+def quantity_expression(steps):
+    return _effect_expression(*_compose(steps))
+
+
+def apply_movements(movements, user=None, batch_size=500):
+    """Apply a batch of stock movements and record them, in one transaction.
+
+    ``movements`` is an iterable of ``(item_id, action, quantity)`` applied in
+    order; TAKE never drives stock below zero, as before. Quantities are
+    changed with one conditional UPDATE per ``batch_size`` items, evaluated by
+    the database, so concurrent movements on the same item cannot lose each
+    other's updates. The items are locked and read first, so each movement
+    is logged with the quantity it actually moved: a TAKE clamped at zero
+    records what was left to take, and reversing it restores exactly that.
+    Returns the created InventoryTransaction rows.
+    """
+    steps_by_item = {}
+    records = []
+    for item_id, action, quantity in movements:
+        if action not in ACTIONS:
+            raise ValueError(f"Unknown inventory action: {action}")
+        if quantity < 0:
+            raise ValueError("Amount must be non-negative")
+        steps_by_item.setdefault(item_id, []).append((action, quantity))
+        records.append(InventoryTransaction(item_id=item_id, action=action, quantity=quantity, performed_by=user))
+    if not records:
+        return []
+
+    with transaction.atomic():
+        item_ids = list(steps_by_item)
+        stock = {}
+        for start in range(0, len(item_ids), batch_size):
+            batch = item_ids[start:start + batch_size]
+            stock.update(InventoryItem.objects.select_for_update().filter(pk__in=batch).values_list("pk", "quantity"))
+            # Items whose movements compose to the same (p, q) share one WHEN branch
+            by_effect = {}
+            for item_id in batch:
+                by_effect.setdefault(_compose(steps_by_item[item_id]), []).append(item_id)
+            updated = InventoryItem.objects.filter(pk__in=batch).update(
+                quantity=Case(
+                    *[When(pk__in=ids, then=_effect_expression(p, q)) for (p, q), ids in by_effect.items()],
+                    default=F("quantity"),
+                    output_field=IntegerField(),
+                )
+            )
+            if updated != len(batch):
+                raise InventoryItem.DoesNotExist("Some inventory items in the batch do not exist.")
+        for record in records:
+            if record.action == "TAKE":
+                record.quantity = min(record.quantity, stock[record.item_id])
+                stock[record.item_id] -= record.quantity
+            else:
+                stock[record.item_id] += record.quantity
+        return InventoryTransaction.objects.bulk_create(records, batch_size=batch_size)
+
+
+def apply_movement(item_id, action, quantity, user=None):
+    return apply_movements([(item_id, action, quantity)], user=user)[0]
+
+
+# Column layout of the workbook produced by download_inventory; the last, hidden column keeps
+# each item's quantity at download time, which the edits in "in" are measured against
+INVENTORY_HEADERS = ["no.", "item", "in", "out", "amount in stock", "downloaded stock"]
+
+
+class InventoryImportError(ValueError):
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__("; ".join(errors))
+
+
+def _count(value, row_number, column, errors):
+    if value is None or value == "":
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        number = -1
+    if number < 0 or number != int(number):
+        errors.append(f"Row {row_number}: '{column}' must be a whole number >= 0, got {value!r}")
+        return None
+    return int(number)
+
+
+def read_inventory_workbook(source):
+    """Yield ``(row_number, number, item, in, out, downloaded)`` from an inventory workbook.
+
+    The sheet is read in openpyxl read-only mode, which streams rows from the
+    file instead of loading the whole workbook. ``downloaded`` is None for
+    rows without a downloaded stock value.
+    """
+    from openpyxl import load_workbook
+
+    wb = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = [str(v).strip().lower() if v is not None else "" for v in next(rows, ())][:len(INVENTORY_HEADERS)]
+        if header[:4] != INVENTORY_HEADERS[:4]:
+            raise InventoryImportError([f"Unexpected header {header!r}, expected {INVENTORY_HEADERS!r}"])
+        downloaded_column = INVENTORY_HEADERS.index("downloaded stock")
+        has_downloaded = header[downloaded_column:] == INVENTORY_HEADERS[downloaded_column:]
+        for row_number, row in enumerate(rows, start=2):
+            row = tuple(row) + (None,) * (len(INVENTORY_HEADERS) - len(row))
+            number, name, qty_in, qty_out = row[:4]
+            downloaded = row[downloaded_column] if has_downloaded else None
+            yield row_number, number, (str(name).strip() if name is not None else ""), qty_in, qty_out, downloaded
+    finally:
+        wb.close()
+
+
+def import_inventory_workbook(source, user=None, dry_run=False):
+    """Apply an edited inventory workbook to the stock.
+
+    Rows are matched to items by ``no.`` through one in-memory map, read and
+    locked in the import's transaction. For a known item, "in" above or below
+    the stock the workbook was downloaded with becomes an ADD or TAKE and
+    "out" becomes a TAKE, so movements recorded since the download are kept
+    rather than overwritten. Rows with an unknown number and an item name
+    create the item. Everything is applied in one transaction through
+    apply_movements(); any invalid row aborts the whole import. Returns a
+    summary dict.
+    """
+    with transaction.atomic():
+        items = {
+            item.number: item
+            for item in InventoryItem.objects.select_for_update().only("number", "item", "quantity")
+        }
+        errors, seen = [], set()
+        movements, renamed, new_items = [], [], []
+
+        for row_number, number, name, qty_in, qty_out, downloaded in read_inventory_workbook(source):
+            number = _count(number, row_number, "no.", errors)
+            qty_in = _count(qty_in, row_number, "in", errors)
+            qty_out = _count(qty_out, row_number, "out", errors) or 0
+            downloaded = _count(downloaded, row_number, "downloaded stock", errors)
+            item = items.get(number)
+            if item is None:
+                if name:
+                    new_items.append((InventoryItem(item=name), qty_in or 0, qty_out))
+                continue  # blank seed rows from an empty download
+            if number in seen:
+                errors.append(f"Row {row_number}: item no. {number} appears more than once")
+                continue
+            seen.add(number)
+
+            if qty_in is not None:
+                if downloaded is None:
+                    errors.append(
+                        f"Row {row_number}: item no. {number} has no downloaded stock; "
+                        "download the inventory again and redo the edit"
+                    )
+                    continue
+                delta = qty_in - downloaded
+                if delta > 0:
+                    movements.append((number, "ADD", delta))
+                elif delta < 0:
+                    movements.append((number, "TAKE", -delta))
+            if qty_out:
+                movements.append((number, "TAKE", qty_out))
+            if name and name != item.item:
+                item.item = name
+                renamed.append(item)
+
+        if errors:
+            raise InventoryImportError(errors)
+        summary = {"created": len(new_items), "renamed": len(renamed), "movements": len(movements)}
+        if dry_run:
+            return summary
+
+        if renamed:
+            InventoryItem.objects.bulk_update(renamed, ["item"])
+        if new_items:
+            created = InventoryItem.objects.bulk_create([item for item, _, _ in new_items])
+            for item, (_, qty_in, qty_out) in zip(created, new_items):
+                if qty_in:
+                    movements.append((item.pk, "ADD", qty_in))
+                if qty_out:
+                    movements.append((item.pk, "TAKE", qty_out))
+        summary["movements"] = len(apply_movements(movements, user=user))
+    return summary
@@ -0,0 +1,92 @@
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db.models import F
+from django.utils import timezone
+
+from .export_cache import cached_export_path
+from .exports import get_export_backend
+from .models import ExportJob
+
+
+def submit_export_job(user, kind, date_from=None, date_to=None):
+    """Queue an export, reusing the user's identical job if one is still queued or running."""
+    requeue_stale_jobs()
+    existing = ExportJob.objects.filter(
+        requested_by=user, kind=kind, date_from=date_from, date_to=date_to,
+        status__in=[ExportJob.STATUS_PENDING, ExportJob.STATUS_RUNNING],
+    ).order_by('-created_at').first()
+    if existing:
+        return existing
+    return ExportJob.objects.create(requested_by=user, kind=kind, date_from=date_from, date_to=date_to)
+
+
+def requeue_stale_jobs():
+    """Put jobs RUNNING for longer than EXPORT_JOB_TIMEOUT back in the queue; returns how many.
+
+    Such a job's worker is taken to have died. Jobs already claimed
+    EXPORT_JOB_MAX_ATTEMPTS times are failed instead, so a job that keeps
+    killing its worker is not retried forever. Both are conditional UPDATEs,
+    safe to run from every worker and request.
+    """
+    stale = ExportJob.objects.filter(
+        status=ExportJob.STATUS_RUNNING,
+        started_at__lt=timezone.now() - timedelta(seconds=settings.EXPORT_JOB_TIMEOUT),
+    )
+    stale.filter(attempts__gte=settings.EXPORT_JOB_MAX_ATTEMPTS).update(
+        status=ExportJob.STATUS_FAILED, finished_at=timezone.now(),
+        error=f"The export worker stopped responding {settings.EXPORT_JOB_MAX_ATTEMPTS} times.",
+    )
+    return stale.update(status=ExportJob.STATUS_PENDING, started_at=None)
+
+
+def claim_next_job():
+    """Atomically move the oldest pending job to RUNNING and return it, or None.
+
+    The claim is a conditional UPDATE, so several workers can poll the same
+    table without a broker or row locks and each job is claimed once.
+    """
+    requeue_stale_jobs()
+    while True:
+        job = ExportJob.objects.filter(status=ExportJob.STATUS_PENDING).order_by('created_at', 'id').first()
+        if job is None:
+            return None
+        started_at = timezone.now()
+        claimed = ExportJob.objects.filter(pk=job.pk, status=ExportJob.STATUS_PENDING).update(
+            status=ExportJob.STATUS_RUNNING, started_at=started_at, attempts=F('attempts') + 1,
+        )
+        if claimed:
+            job.status = ExportJob.STATUS_RUNNING
+            job.started_at = started_at
+            job.attempts += 1
+            return job
+
+
+def run_job(job):
+    """Render a claimed job into MEDIA_ROOT/exports/ and record the outcome."""
+    try:
+        with open(cached_export_path(job.kind, job.date_from, job.date_to), 'rb') as output:
+            job.file.save(f"{job.pk}_{get_export_backend(job.kind).filename}", File(output), save=False)
+        job.status = ExportJob.STATUS_DONE
+    except Exception:
+        job.status = ExportJob.STATUS_FAILED
+        job.error = traceback.format_exc()
+    job.finished_at = timezone.now()
+    job.save(update_fields=['file', 'status', 'error', 'finished_at'])
+    return job
+
+
+def delete_old_jobs():
+    """Delete jobs finished more than EXPORT_JOB_RETENTION_DAYS ago and their MEDIA_ROOT/exports/ files.
+
+    Returns how many jobs were deleted.
+    """
+    cutoff = timezone.now() - timedelta(days=settings.EXPORT_JOB_RETENTION_DAYS)
+    old = ExportJob.objects.filter(
+        status__in=[ExportJob.STATUS_DONE, ExportJob.STATUS_FAILED], finished_at__lt=cutoff,
+    )
+    for job in old.exclude(file='').only('pk', 'file').iterator():
+        job.file.delete(save=False)
+    return old.delete()[0]
@@ -0,0 +1,52 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from reports.archive import archive_tasks, month_start
+from reports.models import TaskSubmission
+
+
+class Command(BaseCommand):
+    help = (
+        "Move tasks from months before a cutoff, with their team members, into monthly Parquet files "
+        "in TASK_ARCHIVE_DIR. Exports keep including them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--before", help="Archive whole months before this date's month (YYYY-MM-DD).")
+        parser.add_argument("--older-than-days", type=int, default=settings.TASK_ARCHIVE_AFTER_DAYS,
+                            help="Cutoff as an age in days, when --before is not given (default: %(default)s).")
+        parser.add_argument("--dry-run", action="store_true", help="List the months that would be archived.")
+
+    def handle(self, *args, **options):
+        if options["before"]:
+            try:
+                before = parse_date(options["before"])
+            except ValueError:
+                before = None
+            if before is None:
+                raise CommandError("--before must be a YYYY-MM-DD date")
+        else:
+            before = timezone.localdate() - timedelta(days=options["older_than_days"])
+
+        if options["dry_run"]:
+            months = (
+                TaskSubmission.objects.filter(submitted_on__lt=month_start(before))
+                .annotate(month=TruncMonth('submitted_on')).order_by('month')
+                .values('month').annotate(tasks=Count('id'))
+            )
+            for row in months:
+                self.stdout.write(f"archive_tasks: would move {row['tasks']} tasks of {row['month']:%Y-%m}")
+            return
+
+        moved = archive_tasks(
+            before, progress=lambda month, count: self.stdout.write(f"archive_tasks: moved {count} tasks of {month:%Y-%m}"),
+        )
+        self.stdout.write(
+            f"archive_tasks: moved {sum(moved.values())} tasks from {len(moved)} months before {month_start(before):%Y-%m}"
+        )
@@ -0,0 +1,93 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+import django
+import json
+import platform
+import tempfile
+
+from reports import bench
+from reports.models import Engineer, InventoryItem, TaskSubmission
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway test database with synthetic data, time the main views through the test client "
+        "and write the results as JSON, optionally comparing them with an earlier run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--engineers", type=int, default=50)
+        parser.add_argument("--tasks", type=int, default=10_000, help="e.g. 10000, 100000 or 1000000.")
+        parser.add_argument("--inventory-items", type=int, default=500)
+        parser.add_argument("--days", type=int, default=365, help="Spread submissions over this many days.")
+        parser.add_argument("--seed", type=int, default=42, help="Random seed for the synthetic data.")
+        parser.add_argument("--repeat", type=int, default=3, help="Timed runs per scenario; the median is kept.")
+        parser.add_argument("--only", action="append", choices=bench.SCENARIOS,
+                            help="Run just this scenario (repeatable).")
+        parser.add_argument("--output", default="bench_results.json", help="Where to write the JSON results.")
+        parser.add_argument("--compare", help="Earlier results JSON to compare against.")
+        parser.add_argument("--threshold", type=float, default=0.2,
+                            help="Relative slowdown or memory growth counted as a regression (default 0.2).")
+        parser.add_argument("--fail-on-regression", action="store_true", help="Exit with an error on regressions.")
+        parser.add_argument("--keepdb", action="store_true",
+                            help="Keep the benchmark database and reuse its data on the next run.")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options["keepdb"], serialize=False)
+        try:
+            if not Engineer.objects.filter(user__username=bench.LEADER_USERNAME).exists():
+                self.stdout.write(f"bench: seeding {options['tasks']} tasks (seed {options['seed']})")
+                bench.seed(
+                    engineers=options["engineers"], tasks=options["tasks"],
+                    inventory_items=options["inventory_items"], days=options["days"], random_seed=options["seed"],
+                )
+            dataset = {
+                "seed": options["seed"],
+                "engineers": Engineer.objects.count(),
+                "tasks": TaskSubmission.objects.count(),
+                "team_links": TaskSubmission.team_members.through.objects.count(),
+                "inventory_items": InventoryItem.objects.count(),
+            }
+            # Exports render in-process, against the benchmark database and with their queries and memory counted
+            with tempfile.TemporaryDirectory() as cache_dir, override_settings(
+                EXPORT_CACHE_DIR=cache_dir, EXPORT_PROCESS_WORKERS=0,
+            ):
+                results = bench.run(names=options["only"], repeat=options["repeat"], cache_dir=cache_dir)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options["keepdb"])
+            teardown_test_environment()
+
+        report = {
+            "dataset": dataset,
+            "environment": {
+                "database": connection.vendor,
+                "python": platform.python_version(),
+                "django": django.get_version(),
+            },
+            "results": results,
+        }
+        with open(options["output"], "w") as fh:
+            json.dump(report, fh, indent=2)
+        for name, result in results.items():
+            self.stdout.write(
+                f"bench: {name} {result['wall_seconds'] * 1000:.1f} ms, {result['queries']} queries, "
+                f"peak {result['peak_memory_bytes'] / 1024 / 1024:.1f} MiB, {result['response_bytes']} bytes"
+            )
+        self.stdout.write(f"bench: wrote {options['output']}")
+
+        if not options["compare"]:
+            return
+        with open(options["compare"]) as fh:
+            previous = json.load(fh)
+        if previous.get("dataset") != dataset:
+            self.stdout.write("bench: warning: the compared run used a different dataset")
+        regressions = bench.compare(previous, report, threshold=options["threshold"])
+        for line in regressions:
+            self.stdout.write(f"bench: REGRESSION {line}")
+        if not regressions:
+            self.stdout.write(f"bench: no regressions against {options['compare']}")
+        elif options["fail_on_regression"]:
+            raise CommandError(f"{len(regressions)} regression(s) against {options['compare']}")
@@ -0,0 +1,34 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+import time
+
+from reports.inventory import InventoryImportError, import_inventory_workbook
+
+
+class Command(BaseCommand):
+    help = "Apply an edited inventory workbook (as produced by download_inventory) to the stock."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Path to the .xlsx file.")
+        parser.add_argument("--user", help="Username to record as performing the movements.")
+        parser.add_argument("--dry-run", action="store_true", help="Report the changes without applying them.")
+
+    def handle(self, *args, **options):
+        user = None
+        if options["user"]:
+            try:
+                user = get_user_model().objects.get(username=options["user"])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"No user named {options['user']!r}")
+
+        started = time.monotonic()
+        try:
+            summary = import_inventory_workbook(options["path"], user=user, dry_run=options["dry_run"])
+        except InventoryImportError as exc:
+            raise CommandError("\n".join(exc.errors))
+
+        self.stdout.write(
+            f"import_inventory: {'would apply' if options['dry_run'] else 'applied'} "
+            f"{summary['movements']} movements, created {summary['created']} items, "
+            f"renamed {summary['renamed']} in {time.monotonic() - started:.1f}s"
+        )
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from reports.models import TaskSubmission
+from reports.task_import import TaskImportError, import_tasks
+
+
+class Command(BaseCommand):
+    help = (
+        "Import historical tasks from an .xlsx or .csv file in the Excel export's column layout. "
+        "Workbook sheets are named by ET ID; a CSV needs an et_id column. Optional task_type and "
+        "team_members (comma-separated ET IDs) columns are read too; the Excel export writes them hidden, and "
+        "its copies of a team task on the members' sheets are not imported again. "
+        "Re-run to resume an interrupted import."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Path to the .xlsx or .csv file.")
+        parser.add_argument("--task-type", choices=[code for code, _ in TaskSubmission.TASK_TYPES],
+                            help="Task type for rows without a task_type column.")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Rows per committed batch.")
+        parser.add_argument("--restart", action="store_true",
+                            help="Forget any earlier progress on this file and import it from the start.")
+
+    def handle(self, *args, **options):
+        def progress(checkpoint, rate):
+            self.stdout.write(
+                f"import_tasks: {checkpoint.rows_read} rows read, {checkpoint.rows_imported} imported, "
+                f"{rate:,.0f} rows/s"
+            )
+
+        try:
+            summary = import_tasks(
+                options["path"], task_type=options["task_type"], batch_size=options["batch_size"],
+                restart=options["restart"], progress=progress,
+            )
+        except (OSError, TaskImportError) as exc:
+            raise CommandError(str(exc))
+
+        for error in summary["errors"]:
+            self.stderr.write(error)
+        resumed = f" (resumed after row {summary['resumed_from']})" if summary["resumed_from"] else ""
+        self.stdout.write(
+            f"import_tasks: imported {summary['imported']} tasks, skipped {summary['skipped']} rows{resumed} "
+            f"in {summary['seconds']:.1f}s, {summary['rows_per_second']:,.0f} rows/s"
+        )
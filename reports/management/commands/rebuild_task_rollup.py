@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from reports import rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the daily engineer/task type rollup table from all task submissions, archived ones "
+        "included. Run it after queryset update()s or raw SQL that change task_type, engineer or "
+        "submitted_at, which bypass the signals keeping the rollup in step."
+    )
+
+    def handle(self, *args, **options):
+        buckets = rollups.rebuild()
+        self.stdout.write(f"rebuild_task_rollup: wrote {buckets} daily buckets")
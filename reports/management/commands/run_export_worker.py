@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+import time
+
+from reports.jobs import claim_next_job, delete_old_jobs, run_job
+
+# Seconds between sweeps of old finished jobs and their files while the queue is idle
+CLEANUP_INTERVAL = 60 * 60
+
+
+class Command(BaseCommand):
+    help = "Claim queued export jobs from the database and render them, deleting old finished ones."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Process the queue until it is empty, then exit.")
+        parser.add_argument("--interval", type=float, default=2.0, help="Seconds to sleep when the queue is empty.")
+
+    def handle(self, *args, **options):
+        last_cleanup = None
+        while True:
+            job = claim_next_job()
+            if job is None:
+                if last_cleanup is None or time.monotonic() - last_cleanup >= CLEANUP_INTERVAL:
+                    deleted = delete_old_jobs()
+                    last_cleanup = time.monotonic()
+                    if deleted:
+                        self.stdout.write(f"run_export_worker: deleted {deleted} old jobs")
+                if options["once"]:
+                    return
+                time.sleep(options["interval"])
+                continue
+
+            started = time.monotonic()
+            run_job(job)
+            self.stdout.write(
+                f"run_export_worker: job {job.pk} ({job.kind}) {job.status} in {time.monotonic() - started:.1f}s"
+            )
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+import json
+
+from reports.changes import changes, decode_watermark
+
+
+class Command(BaseCommand):
+    help = "Write task changes and deletions after a watermark as NDJSON (see /reports/api/tasks/changes/)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", help="Watermark from the last line of the previous run; omit for everything.")
+        parser.add_argument("--limit", type=int, help="Stop after this many changes.")
+        parser.add_argument("--output", help="File to write to instead of stdout.")
+
+    def handle(self, *args, **options):
+        try:
+            decode_watermark(options["since"])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        output = open(options["output"], "w") if options["output"] else None
+        count, last = 0, None
+        try:
+            for line in changes(options["since"], limit=options["limit"]):
+                if output:
+                    output.write(line)
+                else:
+                    self.stdout.write(line, ending="")
+                last = line
+                count += 1
+        finally:
+            if output:
+                output.close()
+        # The data may be on stdout, so the summary goes to stderr
+        self.stderr.write(f"task_changes: {count - 1} changes, watermark {json.loads(last)['watermark']}")
@@ -0,0 +1,304 @@
+import threading
+import time
+from contextvars import ContextVar
+from datetime import timedelta
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db.backends.signals import connection_created
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Q, Sum
+from django.dispatch import receiver
+
+# Upper bounds (seconds) of the latency histogram buckets; +Inf is implicit
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+EXPORT_JOB_BUCKETS = (1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+
+class _ViewStats:
+    __slots__ = ('buckets', 'count', 'seconds', 'queries', 'sql_seconds', 'response_bytes', 'statuses')
+
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.seconds = 0.0
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.response_bytes = 0
+        self.statuses = {}
+
+
+class RequestMetrics:
+    """Per-process request counters, keyed by URL name."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, view, status, seconds, queries, sql_seconds, response_bytes):
+        with self._lock:
+            stats = self._views.get(view)
+            if stats is None:
+                stats = self._views[view] = _ViewStats()
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    stats.buckets[i] += 1
+                    break
+            stats.count += 1
+            stats.seconds += seconds
+            stats.queries += queries
+            stats.sql_seconds += sql_seconds
+            stats.response_bytes += response_bytes
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+
+    def add_response_bytes(self, view, response_bytes):
+        """Count body bytes of a streaming response recorded earlier, as they are sent."""
+        with self._lock:
+            self._views[view].response_bytes += response_bytes
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                view: {
+                    'buckets': list(stats.buckets), 'count': stats.count, 'seconds': stats.seconds,
+                    'queries': stats.queries, 'sql_seconds': stats.sql_seconds,
+                    'response_bytes': stats.response_bytes, 'statuses': dict(stats.statuses),
+                }
+                for view, stats in self._views.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+
+request_metrics = RequestMetrics()
+
+
+class CacheMetrics:
+    """Per-process hit/miss counters, keyed by cache name."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    def record(self, name, hit):
+        with self._lock:
+            key = (name, 'hit' if hit else 'miss')
+            self._counts[key] = self._counts.get(key, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counts)
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+
+cache_metrics = CacheMetrics()
+
+
+class _QueryTimer:
+    """Counts queries and the time spent in them for one request."""
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+# The timer of the request being served. Context variables follow a request
+# into the threads sync_to_async() runs ORM calls in, where ``connection`` is
+# a different object than the one the middleware sees under ASGI.
+_current_timer = ContextVar('request_query_timer', default=None)
+
+
+def _timed_execute(execute, sql, params, many, context):
+    timer = _current_timer.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timer.seconds += time.perf_counter() - started
+        timer.queries += 1
+
+
+@receiver(connection_created)
+def install_query_timer(sender, connection, **kwargs):
+    if _timed_execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_timed_execute)
+
+
+def _count_streamed_bytes(response, view):
+    """Wrap a streaming response's content so its bytes are counted for ``view`` once they are sent."""
+    content = response.streaming_content
+
+    if response.is_async:
+        async def counted():
+            sent = 0
+            try:
+                async for chunk in content:
+                    sent += len(chunk)
+                    yield chunk
+            finally:
+                request_metrics.add_response_bytes(view, sent)
+    else:
+        def counted():
+            sent = 0
+            try:
+                for chunk in content:
+                    sent += len(chunk)
+                    yield chunk
+            finally:
+                request_metrics.add_response_bytes(view, sent)
+
+    response.streaming_content = counted()
+
+
+class RequestMetricsMiddleware:
+    """Record latency, SQL count/time and response size for every ``reports`` view.
+
+    Works in both the WSGI and the ASGI handler without forcing async views
+    through a thread.
+    """
+
+    namespace = 'reports'
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self._acall(request)
+        timer, token, started = self._start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_timer.reset(token)
+        return self._finish(request, response, timer, started)
+
+    async def _acall(self, request):
+        timer, token, started = self._start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_timer.reset(token)
+        return self._finish(request, response, timer, started)
+
+    def _start(self):
+        timer = _QueryTimer()
+        return timer, _current_timer.set(timer), time.perf_counter()
+
+    def _finish(self, request, response, timer, started):
+        elapsed = time.perf_counter() - started
+        match = getattr(request, 'resolver_match', None)
+        if match is not None and match.namespace == self.namespace:
+            # A streamed body is still to be sent; its bytes are added as it goes out
+            request_metrics.record(
+                match.url_name, response.status_code, elapsed, timer.queries, timer.seconds,
+                0 if response.streaming else len(response.content),
+            )
+            if response.streaming:
+                _count_streamed_bytes(response, match.url_name)
+        return response
+
+
+def export_job_durations():
+    """Run times of the finished export jobs still kept, per kind and status, from the ExportJob table.
+
+    Jobs run in the worker processes, so their durations are read from the
+    rows they finish rather than from this process's counters. delete_old_jobs()
+    drops old rows, so these are gauges, not counters. One query.
+    """
+    from .models import ExportJob
+
+    duration = ExpressionWrapper(F('finished_at') - F('started_at'), output_field=DurationField())
+    buckets = {
+        f'le_{i}': Count('id', filter=Q(duration__lte=timedelta(seconds=bound)))
+        for i, bound in enumerate(EXPORT_JOB_BUCKETS)
+    }
+    rows = (
+        ExportJob.objects.filter(started_at__isnull=False, finished_at__isnull=False)
+        .annotate(duration=duration)
+        .order_by().values('kind', 'status')
+        .annotate(count=Count('id'), total=Sum('duration'), **buckets)
+    )
+    return [
+        {
+            'kind': row['kind'], 'status': row['status'], 'count': row['count'],
+            'seconds': row['total'].total_seconds() if row['total'] is not None else 0.0,
+            'buckets': [row[f'le_{i}'] for i in range(len(EXPORT_JOB_BUCKETS))],
+        }
+        for row in rows
+    ]
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{value}"' for name, value in labels.items()) + '}'
+
+
+def _histogram(lines, name, bounds, cumulative_counts, count, total, **labels):
+    for bound, value in zip(bounds, cumulative_counts):
+        lines.append(f'{name}_bucket{_labels(**labels, le=bound)} {value}')
+    lines.append(f'{name}_bucket{_labels(**labels, le="+Inf")} {count}')
+    lines.append(f'{name}_sum{_labels(**labels)} {total:.6f}')
+    lines.append(f'{name}_count{_labels(**labels)} {count}')
+
+
+def render_prometheus():
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    views = sorted(request_metrics.snapshot().items())
+
+    lines.append('# HELP et_request_duration_seconds Request latency per URL name.')
+    lines.append('# TYPE et_request_duration_seconds histogram')
+    for view, stats in views:
+        cumulative, running = [], 0
+        for value in stats['buckets']:
+            running += value
+            cumulative.append(running)
+        _histogram(lines, 'et_request_duration_seconds', LATENCY_BUCKETS, cumulative,
+                   stats['count'], stats['seconds'], view=view)
+
+    for name, key, help_text in (
+        ('et_request_db_queries_total', 'queries', 'Database queries run while serving requests.'),
+        ('et_request_db_seconds_total', 'sql_seconds', 'Time spent in database queries while serving requests.'),
+        ('et_response_bytes_total', 'response_bytes', 'Response body bytes sent.'),
+    ):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} counter')
+        for view, stats in views:
+            value = stats[key]
+            lines.append(f'{name}{_labels(view=view)} {value:.6f}' if isinstance(value, float) else
+                         f'{name}{_labels(view=view)} {value}')
+
+    lines.append('# HELP et_responses_total Responses per URL name and status code.')
+    lines.append('# TYPE et_responses_total counter')
+    for view, stats in views:
+        for status, value in sorted(stats['statuses'].items()):
+            lines.append(f'et_responses_total{_labels(view=view, status=status)} {value}')
+
+    lines.append('# HELP et_cache_requests_total Cache lookups per cache and result (hit or miss).')
+    lines.append('# TYPE et_cache_requests_total counter')
+    for (name, result), value in sorted(cache_metrics.snapshot().items()):
+        lines.append(f'et_cache_requests_total{_labels(cache=name, result=result)} {value}')
+
+    jobs = export_job_durations()
+    lines.append('# HELP et_export_jobs Finished export jobs still kept (EXPORT_JOB_RETENTION_DAYS).')
+    lines.append('# TYPE et_export_jobs gauge')
+    for row in jobs:
+        lines.append(f'et_export_jobs{_labels(kind=row["kind"], status=row["status"])} {row["count"]}')
+    lines.append('# HELP et_export_jobs_within_seconds Kept finished export jobs that ran for at most le seconds.')
+    lines.append('# TYPE et_export_jobs_within_seconds gauge')
+    for row in jobs:
+        for bound, value in zip(EXPORT_JOB_BUCKETS, row['buckets']):
+            lines.append(f'et_export_jobs_within_seconds{_labels(kind=row["kind"], status=row["status"], le=bound)} {value}')
+    lines.append('# HELP et_export_jobs_seconds Total run time of the kept finished export jobs.')
+    lines.append('# TYPE et_export_jobs_seconds gauge')
+    for row in jobs:
+        lines.append(f'et_export_jobs_seconds{_labels(kind=row["kind"], status=row["status"])} {row["seconds"]:.6f}')
+    return '\n'.join(lines) + '\n'
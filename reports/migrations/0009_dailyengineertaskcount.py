@@ -0,0 +1,47 @@
+# Generated by Django 5.2.4 on 2026-10-17 19:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def populate_rollup(apps, schema_editor):
+    TaskSubmission = apps.get_model('reports', 'TaskSubmission')
+    DailyEngineerTaskCount = apps.get_model('reports', 'DailyEngineerTaskCount')
+    buckets = (
+        TaskSubmission.objects.annotate(day=TruncDate('submitted_at'))
+        .values('day', 'engineer_id', 'task_type')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    DailyEngineerTaskCount.objects.bulk_create(
+        (DailyEngineerTaskCount(date=b['day'], engineer_id=b['engineer_id'], task_type=b['task_type'], count=b['count'])
+         for b in buckets.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0008_dataversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyEngineerTaskCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('task_type', models.CharField(choices=[('PM', 'Preventive Maintenance'), ('RT', 'Routine Task'), ('MT', 'Maintenance Task')], max_length=2)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('engineer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_task_counts', to='reports.engineer')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date', 'engineer'], name='reports_dai_date_c9180f_idx')],
+                'constraints': [models.UniqueConstraint(fields=('engineer', 'date', 'task_type'), name='unique_daily_engineer_task_count')],
+            },
+        ),
+        migrations.RunPython(populate_rollup, migrations.RunPython.noop),
+    ]
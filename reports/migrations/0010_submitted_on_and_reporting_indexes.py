@@ -0,0 +1,46 @@
+from django.db import migrations, models
+from django.db.models.functions import TruncDate
+import django.utils.timezone
+
+
+def backfill_submitted_on(apps, schema_editor):
+    TaskSubmission = apps.get_model('reports', 'TaskSubmission')
+    TaskSubmission.objects.update(submitted_on=TruncDate('submitted_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0009_dailyengineertaskcount'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tasksubmission',
+            name='submitted_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tasksubmission',
+            name='submitted_on',
+            field=models.DateField(editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_submitted_on, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='tasksubmission',
+            name='submitted_on',
+            field=models.DateField(editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='tasksubmission',
+            index=models.Index(fields=['submitted_at', 'id'], name='task_submitted_at_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tasksubmission',
+            index=models.Index(fields=['submitted_on', 'task_type'], name='task_submitted_on_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tasksubmission',
+            index=models.Index(fields=['engineer', 'submitted_on'], name='task_engineer_submitted_idx'),
+        ),
+    ]
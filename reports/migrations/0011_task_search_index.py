@@ -0,0 +1,70 @@
+from django.db import migrations
+
+# Frozen copy of the index as this migration first built it; reports.search may change later
+FTS_TABLE = 'reports_task_fts'
+FTS_TRIGGERS = {
+    'reports_task_fts_ai': f"""
+        CREATE TRIGGER IF NOT EXISTS reports_task_fts_ai AFTER INSERT ON reports_tasksubmission BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, description, cause_of_problem, corrective_measure)
+            VALUES (new.id, new.description, new.cause_of_problem, new.corrective_measure);
+        END""",
+    'reports_task_fts_ad': f"""
+        CREATE TRIGGER IF NOT EXISTS reports_task_fts_ad AFTER DELETE ON reports_tasksubmission BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description, cause_of_problem, corrective_measure)
+            VALUES ('delete', old.id, old.description, old.cause_of_problem, old.corrective_measure);
+        END""",
+    'reports_task_fts_au': f"""
+        CREATE TRIGGER IF NOT EXISTS reports_task_fts_au AFTER UPDATE ON reports_tasksubmission BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description, cause_of_problem, corrective_measure)
+            VALUES ('delete', old.id, old.description, old.cause_of_problem, old.corrective_measure);
+            INSERT INTO {FTS_TABLE}(rowid, description, cause_of_problem, corrective_measure)
+            VALUES (new.id, new.description, new.cause_of_problem, new.corrective_measure);
+        END""",
+}
+PG_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(description, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(cause_of_problem, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(corrective_measure, '')), 'B')"
+)
+
+
+def create_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            "description, cause_of_problem, corrective_measure, "
+            "content='reports_tasksubmission', content_rowid='id', tokenize='porter unicode61')"
+        )
+        for sql in FTS_TRIGGERS.values():
+            schema_editor.execute(sql)
+        schema_editor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            "ALTER TABLE reports_tasksubmission ADD COLUMN IF NOT EXISTS search_vector tsvector "
+            f"GENERATED ALWAYS AS ({PG_VECTOR}) STORED"
+        )
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS task_search_vector_gin ON reports_tasksubmission USING GIN (search_vector)"
+        )
+
+
+def drop_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for name in FTS_TRIGGERS:
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    elif vendor == 'postgresql':
+        schema_editor.execute("ALTER TABLE reports_tasksubmission DROP COLUMN IF EXISTS search_vector")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0010_submitted_on_and_reporting_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,71 @@
+from django.db import migrations, models
+
+BATCH_SIZE = 2000
+
+# Frozen copies: the migration must keep doing what it did when it was written
+FTS_TABLE = 'reports_task_fts'
+_FTS_UPDATE_BODY = f"""
+    INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description, cause_of_problem, corrective_measure)
+    VALUES ('delete', old.id, old.description, old.cause_of_problem, old.corrective_measure);
+    INSERT INTO {FTS_TABLE}(rowid, description, cause_of_problem, corrective_measure)
+    VALUES (new.id, new.description, new.cause_of_problem, new.corrective_measure);"""
+# Reindex only when the searched text changes, so the backfill below does not rewrite the FTS table
+NARROW_UPDATE_TRIGGER = (
+    "CREATE TRIGGER IF NOT EXISTS reports_task_fts_au AFTER UPDATE OF description, cause_of_problem, "
+    f"corrective_measure ON reports_tasksubmission BEGIN{_FTS_UPDATE_BODY}\nEND"
+)
+# 0011's trigger, which fires on any update
+WIDE_UPDATE_TRIGGER = (
+    f"CREATE TRIGGER IF NOT EXISTS reports_task_fts_au AFTER UPDATE ON reports_tasksubmission BEGIN{_FTS_UPDATE_BODY}\nEND"
+)
+
+
+def duration_seconds(start, end):
+    if start and end and end >= start:
+        return int((end - start).total_seconds())
+    return None
+
+
+def _replace_update_trigger(schema_editor, sql):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TRIGGER IF EXISTS reports_task_fts_au')
+        schema_editor.execute(sql)
+
+
+def narrow_search_trigger(apps, schema_editor):
+    _replace_update_trigger(schema_editor, NARROW_UPDATE_TRIGGER)
+
+
+def widen_search_trigger(apps, schema_editor):
+    _replace_update_trigger(schema_editor, WIDE_UPDATE_TRIGGER)
+
+
+def backfill_duration_seconds(apps, schema_editor):
+    TaskSubmission = apps.get_model('reports', 'TaskSubmission')
+    timed = TaskSubmission.objects.filter(start_time__isnull=False, end_time__isnull=False).order_by('pk')
+    last_pk = 0
+    while True:
+        batch = list(timed.filter(pk__gt=last_pk).only('pk', 'start_time', 'end_time')[:BATCH_SIZE])
+        if not batch:
+            break
+        for task in batch:
+            task.duration_seconds = duration_seconds(task.start_time, task.end_time)
+        TaskSubmission.objects.bulk_update(batch, ['duration_seconds'], batch_size=500)
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0011_task_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tasksubmission',
+            name='duration_seconds',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(narrow_search_trigger, widen_search_trigger),
+        migrations.RunPython(backfill_duration_seconds, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+from django.db import migrations, models
+from django.db.models import F
+import django.utils.timezone
+
+
+def backfill_updated_at(apps, schema_editor):
+    TaskSubmission = apps.get_model('reports', 'TaskSubmission')
+    TaskSubmission.objects.update(updated_at=F('submitted_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0012_tasksubmission_duration_seconds'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tasksubmission',
+            name='updated_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='tasksubmission',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='tasksubmission',
+            index=models.Index(fields=['updated_at', 'id'], name='task_updated_at_id_idx'),
+        ),
+        migrations.CreateModel(
+            name='TaskTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['deleted_at', 'id'], name='tombstone_deleted_at_id_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-17 19:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0013_updated_at_and_tasktombstone'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=255, unique=True)),
+                ('file_size', models.PositiveBigIntegerField()),
+                ('rows_read', models.PositiveBigIntegerField(default=0)),
+                ('offset', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('rows_imported', models.PositiveBigIntegerField(default=0)),
+                ('rows_skipped', models.PositiveBigIntegerField(default=0)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-17 20:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0016_exportjob_attempts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taskimport',
+            name='sha256',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='taskimport',
+            name='source',
+            field=models.CharField(max_length=255),
+        ),
+    ]
@@ -1,7 +1,14 @@
 from django.db import models
+from django.db.models import F
 from django.contrib.auth.models import User
 from django.utils import timezone
 
+def duration_seconds(start, end):
+    """Whole seconds from ``start`` to ``end``, or None if either is missing or end is earlier."""
+    if start and end and end >= start:
+        return int((end - start).total_seconds())
+    return None
+
 class Engineer(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     et_id = models.CharField(max_length=10, unique=True)
@@ -37,24 +44,76 @@ class TaskSubmission(models.Model):
     start_time = models.DateTimeField(null=True, blank=True)
     end_time = models.DateTimeField(null=True, blank=True)
     time_taken = models.CharField(max_length=100, blank=True, null=True)
+    # end_time - start_time in whole seconds, so repair times can be aggregated in SQL
+    duration_seconds = models.PositiveIntegerField(null=True, blank=True, editable=False)
 
     # Status/remarks
     status = models.CharField(max_length=50, blank=True)
     remark = models.TextField(blank=True)
 
-    submitted_at = models.DateTimeField(auto_now_add=True)
+    submitted_at = models.DateTimeField(default=timezone.now, editable=False)
+    # Local date of submitted_at, stored so date filters can use an index instead of wrapping the column
+    submitted_on = models.DateField(editable=False)
+    # Last change to the row or its team members, for the change feed
+    updated_at = models.DateTimeField(auto_now=True)
     team_members = models.ManyToManyField(Engineer, related_name='tasks_assigned', blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['submitted_at', 'id'], name='task_submitted_at_id_idx'),
+            models.Index(fields=['submitted_on', 'task_type'], name='task_submitted_on_type_idx'),
+            models.Index(fields=['engineer', 'submitted_on'], name='task_engineer_submitted_idx'),
+            models.Index(fields=['updated_at', 'id'], name='task_updated_at_id_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what was loaded so rollups can tell what an edit moved away from
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        # Reloaded values are what the row is counted under now, not what from_db() saw
+        attnames = [self._meta.get_field(name).attname for name in fields] if fields else [
+            field.attname for field in self._meta.concrete_fields
+        ]
+        self._loaded_values = {
+            **getattr(self, '_loaded_values', {}),
+            **{name: self.__dict__[name] for name in attnames if name in self.__dict__},
+        }
+
+    def set_derived_fields(self):
+        """Fill the fields computed from others; also used by bulk paths that skip save()."""
+        self.duration_seconds = duration_seconds(self.start_time, self.end_time)
+        if self.duration_seconds is not None and not self.time_taken:
+            self.time_taken = str(self.end_time - self.start_time)
+        self.submitted_on = timezone.localdate(self.submitted_at)
+
     def save(self, *args, **kwargs):
-        if self.start_time and self.end_time:
-            calculated = self.end_time - self.start_time
-            if calculated.total_seconds() >= 0 and not self.time_taken:
-                self.time_taken = str(calculated)
+        self.set_derived_fields()
         super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.task_type} by {self.engineer.name} on {self.date}"
 
+class DailyEngineerTaskCount(models.Model):
+    """Per day, engineer and task type count of submissions, kept in step by signals."""
+    date = models.DateField()
+    engineer = models.ForeignKey(Engineer, on_delete=models.CASCADE, related_name='daily_task_counts')
+    task_type = models.CharField(max_length=2, choices=TaskSubmission.TASK_TYPES)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['engineer', 'date', 'task_type'], name='unique_daily_engineer_task_count'),
+        ]
+        indexes = [models.Index(fields=['date', 'engineer'])]
+
+    def __str__(self):
+        return f"{self.date} {self.engineer_id} {self.task_type}: {self.count}"
+
 class InventoryItem(models.Model):
     number = models.AutoField(primary_key=True)
     item = models.CharField(max_length=255)
@@ -65,13 +124,20 @@ class InventoryItem(models.Model):
     def balance(self):
         return self.quantity * self.price
 
-    def decrease(self, amount: int):
+    def _move(self, action: str, amount: int):
+        from .inventory import quantity_expression
+
         if amount < 0:
             raise ValueError("Amount must be non-negative")
-        if amount > self.quantity:
-            amount = self.quantity
-        self.quantity -= amount
-        self.save(update_fields=["quantity"])
+        # Computed by the database against the current row, so concurrent moves are not lost
+        InventoryItem.objects.filter(pk=self.pk).update(quantity=quantity_expression([(action, amount)]))
+        self.refresh_from_db(fields=["quantity"])
+
+    def decrease(self, amount: int):
+        self._move("TAKE", amount)
+
+    def increase(self, amount: int):
+        self._move("ADD", amount)
 
     def __str__(self) -> str:
         return f"{self.number}. {self.item}"
@@ -91,5 +157,111 @@ class InventoryTransaction(models.Model):
         if self.action == "TAKE":
             self.item.decrease(self.quantity)
         elif self.action == "ADD":
-            self.item.quantity += self.quantity
-            self.item.save(update_fields=["quantity"])
\ No newline at end of file
+            self.item.increase(self.quantity)
+
+class ExportJob(models.Model):
+    KIND_CHOICES = (
+        ("excel", "Excel"),
+        ("pdf", "PDF"),
+    )
+    STATUS_PENDING = "PENDING"
+    STATUS_RUNNING = "RUNNING"
+    STATUS_DONE = "DONE"
+    STATUS_FAILED = "FAILED"
+    STATUS_CHOICES = (
+        (STATUS_PENDING, "Pending"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_DONE, "Done"),
+        (STATUS_FAILED, "Failed"),
+    )
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    date_from = models.DateField(null=True, blank=True)
+    date_to = models.DateField(null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    file = models.FileField(upload_to="exports/", blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)  # times a worker claimed it
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "created_at"])]
+
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_DONE, self.STATUS_FAILED)
+
+    def __str__(self) -> str:
+        return f"{self.kind} export #{self.pk} ({self.status})"
+
+
+class TaskImport(models.Model):
+    """Progress of an import_tasks run, saved with each batch so an interrupted import resumes."""
+    source = models.CharField(max_length=255)  # file name
+    # Of the file's content, which is what identifies an import; NULL on checkpoints made before it was kept
+    sha256 = models.CharField(max_length=64, unique=True, null=True, blank=True)
+    file_size = models.PositiveBigIntegerField()
+    rows_read = models.PositiveBigIntegerField(default=0)  # data rows consumed, imported or not
+    offset = models.PositiveBigIntegerField(null=True, blank=True)  # CSV byte offset after rows_read
+    rows_imported = models.PositiveBigIntegerField(default=0)
+    rows_skipped = models.PositiveBigIntegerField(default=0)
+    started_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self) -> str:
+        return f"import of {self.source}: {self.rows_imported} tasks"
+
+
+class TaskArchive(models.Model):
+    """Manifest entry for a month of tasks moved out of TaskSubmission into a Parquet file."""
+    month = models.DateField(unique=True)  # first day of the month, by submitted_on
+    file = models.CharField(max_length=255)  # name within TASK_ARCHIVE_DIR
+    rows = models.PositiveIntegerField()
+    sha256 = models.CharField(max_length=64)
+    archived_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"tasks of {self.month:%Y-%m}: {self.rows} rows in {self.file}"
+
+
+class TaskTombstone(models.Model):
+    """Id of a deleted TaskSubmission, so change-feed readers can delete it too."""
+    task_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [models.Index(fields=['deleted_at', 'id'], name='tombstone_deleted_at_id_idx')]
+
+    def __str__(self) -> str:
+        return f"task {self.task_id} deleted {self.deleted_at:%Y-%m-%d %H:%M}"
+
+
+class DataVersion(models.Model):
+    """Monotonic counter bumped whenever a set of data changes, used to key caches."""
+    TASKS = "tasks"
+    ENGINEERS = "engineers"
+
+    key = models.CharField(max_length=50, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+
+    @classmethod
+    def current(cls, key):
+        return cls.objects.filter(key=key).values_list("version", flat=True).first() or 0
+
+    @classmethod
+    async def acurrent(cls, key):
+        return await cls.objects.filter(key=key).values_list("version", flat=True).afirst() or 0
+
+    @classmethod
+    def bump(cls, key):
+        if not cls.objects.filter(key=key).update(version=F("version") + 1):
+            obj, created = cls.objects.get_or_create(key=key, defaults={"version": 1})
+            if not created:
+                cls.objects.filter(key=key).update(version=F("version") + 1)
+
+    def __str__(self) -> str:
+        return f"{self.key} v{self.version}"
@@ -0,0 +1,107 @@
+import base64
+import binascii
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+# Below this many (estimated) rows an exact COUNT(*) is cheap enough
+ESTIMATED_COUNT_THRESHOLD = 100_000
+
+
+def encode_cursor(task):
+    """Opaque cursor for the position just after ``task`` in (submitted_at, id) order."""
+    raw = f"{task.submitted_at.isoformat()}|{task.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return ``(submitted_at, id)`` from a cursor, or None if it is missing or malformed."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        submitted_at, pk = raw.split('|')
+        submitted_at = parse_datetime(submitted_at)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if submitted_at is None:
+        return None
+    return submitted_at, pk
+
+
+def keyset_page(queryset, cursor=None, page_size=50):
+    """One page of ``queryset`` newest first, continuing after ``cursor``.
+
+    Seeks on (submitted_at, id) instead of using OFFSET, so every page costs
+    the same however deep into the history it is. Returns the page as a list
+    and the cursor for the next page (None on the last one).
+    """
+    items = list(_seek(queryset, cursor)[:page_size + 1])
+    return _page(items, page_size)
+
+
+async def akeyset_page(queryset, cursor=None, page_size=50):
+    """keyset_page() for async views, reading the page with aiterator()."""
+    items = [item async for item in _seek(queryset, cursor)[:page_size + 1].aiterator(chunk_size=page_size + 1)]
+    return _page(items, page_size)
+
+
+def _seek(queryset, cursor):
+    queryset = queryset.order_by('-submitted_at', '-id')
+    position = decode_cursor(cursor)
+    if position:
+        submitted_at, pk = position
+        queryset = queryset.filter(Q(submitted_at__lt=submitted_at) | Q(submitted_at=submitted_at, id__lt=pk))
+    return queryset
+
+
+def _page(items, page_size):
+    next_cursor = encode_cursor(items[page_size - 1]) if len(items) > page_size else None
+    return items[:page_size], next_cursor
+
+
+def estimated_row_count(model, using='default'):
+    """The planner's row estimate for ``model``'s table, or None if there is none.
+
+    PostgreSQL keeps one in pg_class; SQLite has one in sqlite_stat1 once
+    ANALYZE (or PRAGMA optimize) has run.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+        elif connection.vendor == 'sqlite':
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None
+            cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table])
+        else:
+            return None
+        row = cursor.fetchone()
+    if row is None or row[0] is None:
+        return None
+    count = int(str(row[0]).split()[0])
+    return count if count >= 0 else None  # PostgreSQL reports -1 before the first ANALYZE
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that does not COUNT(*) a whole large table.
+
+    An unfiltered queryset over a table the database estimates at
+    ESTIMATED_COUNT_THRESHOLD rows or more uses that estimate; filtered
+    querysets and small tables are counted exactly.
+    """
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is not None and not query.where:
+            estimate = estimated_row_count(self.object_list.model, self.object_list.db)
+            if estimate is not None and estimate >= ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return super().count
@@ -0,0 +1,211 @@
+import heapq
+import os
+import tempfile
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import Count, Q
+from django.template.loader import render_to_string
+from pypdf import PdfReader
+from pypdf.generic import (
+    ArrayObject, DictionaryObject, IndirectObject, NameObject, NullObject, NumberObject, StreamObject,
+)
+
+from .models import Engineer
+
+
+def pdf_summary_rows(tasks, archived=None):
+    """PM/RT/MT/total per engineer for ``tasks``, pivoted by the database.
+
+    One grouped query with conditional counts plus the engineer list, however
+    many tasks or engineers there are. The ArchivedTasks ``archived`` are
+    counted too.
+    """
+    counts = {
+        row['engineer_id']: row
+        for row in tasks.order_by().values('engineer_id').annotate(
+            pm=Count('id', filter=Q(task_type='PM')),
+            rt=Count('id', filter=Q(task_type='RT')),
+            mt=Count('id', filter=Q(task_type='MT')),
+            total=Count('id'),
+        )
+    }
+    for task, _ in archived or ():
+        row = counts.setdefault(task.engineer_id, {'pm': 0, 'rt': 0, 'mt': 0, 'total': 0})
+        row[task.task_type.lower()] += 1
+        row['total'] += 1
+    rows = []
+    for engineer in Engineer.objects.order_by('id'):
+        row = counts.get(engineer.pk, {})
+        rows.append({
+            'et_id': engineer.et_id,
+            'name': engineer.name,
+            'pm': row.get('pm', 0),
+            'rt': row.get('rt', 0),
+            'mt': row.get('mt', 0),
+            'total': row.get('total', 0),
+        })
+    return rows
+
+
+def _render_pdf(context, target, base_url):
+    from weasyprint import HTML
+
+    html = render_to_string('pdf_template.html', context)
+    stylesheets = ['/static/css/pdf_styles.css'] if os.path.exists('/static/css/pdf_styles.css') else []
+    HTML(string=html, base_url=base_url).write_pdf(target, stylesheets=stylesheets)
+
+
+def _archived_details(archived):
+    if archived is None:
+        return
+    engineers = Engineer.objects.only('et_id', 'name').in_bulk()
+    for task in archived.by_submitted_at():
+        yield {
+            'id': task.pk,
+            'engineer__et_id': engineers[task.engineer_id].et_id,
+            'engineer__name': engineers[task.engineer_id].name,
+            'task_type': task.task_type,
+            'description': task.description,
+            'equipment_type': task.equipment_type,
+            'submitted_at': task.submitted_at,
+        }
+
+
+def _detail_order(row):
+    return row['submitted_at'], row['id']
+
+
+def write_tasks_pdf(tasks, fileobj, base_url=None, chunk_rows=None, archived=None):
+    """Render the task summary report for ``tasks`` as a PDF into ``fileobj``.
+
+    Ranges with more than ``PDF_CHUNK_ROWS`` tasks render the detail table in
+    batches of that many rows, each to its own temporary PDF, and concatenate
+    them, so WeasyPrint never lays out more than one batch at a time.
+    The ArchivedTasks ``archived``, streamed from the task archive, are
+    reported along with ``tasks``.
+    """
+    chunk_rows = chunk_rows or settings.PDF_CHUNK_ROWS
+    summary = pdf_summary_rows(tasks, archived)
+    details = tasks.order_by('submitted_at', 'id').values(
+        'id', 'engineer__et_id', 'engineer__name', 'task_type',
+        'description', 'equipment_type', 'submitted_at',
+    )
+
+    if sum(row['total'] for row in summary) <= chunk_rows:
+        rows = heapq.merge(details, _archived_details(archived), key=_detail_order)
+        _render_pdf({'summary': summary, 'tasks': list(rows)}, fileobj, base_url)
+        return
+
+    rows = heapq.merge(details.iterator(chunk_size=chunk_rows), _archived_details(archived), key=_detail_order)
+    batches = iter(lambda: list(islice(rows, chunk_rows)), [])
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for index, batch in enumerate(batches):
+            paths.append(os.path.join(tmp, f'{index}.pdf'))
+            _render_pdf({'summary': summary if index == 0 else None, 'tasks': batch}, paths[-1], base_url)
+        concatenate_pdfs(paths, fileobj)
+
+
+class _Output:
+    """Write-through wrapper of a binary file that counts the bytes written, for the xref offsets."""
+
+    def __init__(self, fileobj):
+        self.fileobj, self.position = fileobj, 0
+
+    def write(self, data):
+        self.fileobj.write(data)
+        self.position += len(data)
+
+    def tell(self):
+        return self.position
+
+
+def _renumbered(value, number):
+    """A copy of ``value`` with every indirect reference pointed at ``number(old idnum)``.
+
+    The reader's objects are left as they are: one reached again through
+    another parent must still hold its old numbers.
+    """
+    if isinstance(value, IndirectObject):
+        return IndirectObject(number(value.idnum), 0, None)
+    if isinstance(value, DictionaryObject):
+        if isinstance(value, StreamObject):
+            copy = type(value)()
+            copy._data = value._data  # written as read, filters and all
+        else:
+            copy = DictionaryObject()
+        for key, item in dict.items(value):
+            dict.__setitem__(copy, key, _renumbered(item, number))
+        return copy
+    if isinstance(value, ArrayObject):
+        return ArrayObject(_renumbered(item, number) for item in value)
+    return value
+
+
+def concatenate_pdfs(paths, fileobj):
+    """Write the PDFs at ``paths`` into ``fileobj`` as one document, page after page.
+
+    Each input is read on its own and the objects its pages use are written
+    out, as renumbered copies, as soon as they are reached; only their
+    offsets and the page object numbers stay in memory for the final page
+    tree and xref table, so memory holds one input at a time however many
+    are joined. Document-level parts of the inputs (outlines, named
+    destinations) are not carried over.
+    """
+    out = _Output(fileobj)
+    out.write(b'%PDF-1.7\n%\xe2\xe3\xcf\xd3\n')
+    catalog, page_tree = 1, 2
+    offsets, kids = {}, []
+    next_number = 3
+
+    def write(idnum, obj):
+        offsets[idnum] = out.tell()
+        out.write(f'{idnum} 0 obj\n'.encode())
+        obj.write_to_stream(out)
+        out.write(b'\nendobj\n')
+
+    for path in paths:
+        with PdfReader(path) as reader:
+            numbers, pending = {}, []
+
+            def number(idnum):
+                nonlocal next_number
+                if idnum not in numbers:
+                    numbers[idnum], next_number = next_number, next_number + 1
+                    pending.append(idnum)
+                return numbers[idnum]
+
+            # reader.pages have their inherited attributes filled in; each moves under the one
+            # page tree, so its old parent and the rest of its tree are left behind
+            pages = {page.indirect_reference.idnum: page for page in reader.pages}
+            for idnum in pages:
+                kids.append(number(idnum))
+            while pending:
+                idnum = pending.pop()
+                if idnum in pages:
+                    obj = _renumbered(
+                        DictionaryObject({key: value for key, value in dict.items(pages[idnum]) if key != '/Parent'}),
+                        number,
+                    )
+                    obj[NameObject('/Parent')] = IndirectObject(page_tree, 0, None)
+                else:
+                    obj = reader.get_object(idnum)
+                    obj = _renumbered(NullObject() if obj is None else obj, number)
+                write(numbers[idnum], obj)
+
+    write(page_tree, DictionaryObject({
+        NameObject('/Type'): NameObject('/Pages'),
+        NameObject('/Kids'): ArrayObject(IndirectObject(kid, 0, None) for kid in kids),
+        NameObject('/Count'): NumberObject(len(kids)),
+    }))
+    write(catalog, DictionaryObject({
+        NameObject('/Type'): NameObject('/Catalog'),
+        NameObject('/Pages'): IndirectObject(page_tree, 0, None),
+    }))
+    xref = out.tell()
+    size = max(offsets) + 1
+    out.write(f'xref\n0 {size}\n0000000000 65535 f \n'.encode())
+    for idnum in range(1, size):
+        out.write(f'{offsets[idnum]:010d} 00000 n \n'.encode() if idnum in offsets else b'0000000000 65535 f \n')
+    out.write(f'trailer\n<< /Size {size} /Root {catalog} 0 R >>\nstartxref\n{xref}\n%%EOF\n'.encode())
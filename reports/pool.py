@@ -0,0 +1,44 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _init_worker():
+    import django
+
+    django.setup()
+
+
+def get_pool():
+    """The process pool CPU-heavy export rendering runs in under ASGI, created on first use.
+
+    Workers are spawned rather than forked, so they never share the parent's
+    database connections, and there are at most EXPORT_PROCESS_WORKERS of them.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.EXPORT_PROCESS_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+            )
+        return _pool
+
+
+async def run_in_pool(func, *args):
+    """Await ``func(*args)`` in the export process pool without blocking the event loop.
+
+    With EXPORT_PROCESS_WORKERS = 0 it runs in this process instead, on the
+    thread (and database connection) sync code would use.
+    """
+    if not settings.EXPORT_PROCESS_WORKERS:
+        return await sync_to_async(func)(*args)
+    return await asyncio.get_running_loop().run_in_executor(get_pool(), func, *args)
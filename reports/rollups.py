@@ -0,0 +1,133 @@
+"""Daily per engineer and task type counts of submissions (DailyEngineerTaskCount).
+
+The counts are kept in step by the TaskSubmission save/delete signals and by
+bulk_create_tasks(). Anything that bypasses both, such as
+``TaskSubmission.objects.filter(...).update(task_type=...)``, a queryset
+``update()`` of ``submitted_at`` or ``engineer``, or raw SQL, leaves them
+wrong: call adjust() for the buckets such a change moves, or run the
+rebuild_task_rollup command afterwards. (archive_tasks deletes with raw SQL
+on purpose, so archived tasks keep counting.)
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Case, Count, F, FilteredRelation, IntegerField, Q, Sum, When
+from django.db.models.functions import Coalesce
+
+from .archive import archived_tasks
+from .models import DailyEngineerTaskCount, Engineer, TaskSubmission
+
+_KEY_FIELDS = ('submitted_on', 'engineer_id', 'task_type')
+
+
+def rollup_key(task):
+    """The (date, engineer_id, task_type) bucket a submission is counted under."""
+    return (task.submitted_on, task.engineer_id, task.task_type)
+
+
+def loaded_rollup_key(task):
+    """Bucket the row was counted under when it was read from the database, if known."""
+    loaded = getattr(task, '_loaded_values', None)
+    if loaded is None or not all(f in loaded for f in _KEY_FIELDS):
+        return None
+    return (loaded['submitted_on'], loaded['engineer_id'], loaded['task_type'])
+
+
+def remember_rollup_key(task):
+    """Record the bucket ``task`` is now counted under, for its next save or delete."""
+    task._loaded_values = {**getattr(task, '_loaded_values', {}), **{f: getattr(task, f) for f in _KEY_FIELDS}}
+
+
+def adjust(key, delta):
+    """Add ``delta`` to one rollup bucket with a single atomic UPDATE where possible."""
+    day, engineer_id, task_type = key
+    counts = DailyEngineerTaskCount.objects.filter(date=day, engineer_id=engineer_id, task_type=task_type)
+    if delta > 0:
+        if not counts.update(count=F('count') + delta):
+            with transaction.atomic():
+                obj, created = DailyEngineerTaskCount.objects.get_or_create(
+                    date=day, engineer_id=engineer_id, task_type=task_type, defaults={'count': delta},
+                )
+            if not created:
+                counts.update(count=F('count') + delta)
+    elif delta < 0:
+        counts.filter(count__lte=-delta).delete()
+        counts.update(count=F('count') + delta)
+
+
+def add_counts(counts, batch_size=500):
+    """Add positive ``key -> delta`` counts with three queries per batch of buckets.
+
+    Missing buckets are inserted at zero (ignoring ones that already exist or
+    appear concurrently), then the batch is incremented by one conditional
+    UPDATE on their ids, so concurrent writers cannot lose counts.
+    """
+    counts = [(key, delta) for key, delta in counts.items() if delta > 0]
+    if len(counts) == 1:
+        return adjust(*counts[0])  # usually a single UPDATE of an existing bucket
+    for start in range(0, len(counts), batch_size):
+        batch = dict(counts[start:start + batch_size])
+        DailyEngineerTaskCount.objects.bulk_create(
+            [DailyEngineerTaskCount(date=day, engineer_id=engineer_id, task_type=task_type, count=0)
+             for day, engineer_id, task_type in batch],
+            ignore_conflicts=True,
+        )
+        ids_by_delta = {}
+        candidates = DailyEngineerTaskCount.objects.filter(
+            date__in={day for day, _, _ in batch}, engineer_id__in={engineer_id for _, engineer_id, _ in batch},
+        ).values_list('pk', 'date', 'engineer_id', 'task_type')
+        for pk, *key in candidates:
+            delta = batch.get(tuple(key))
+            if delta:
+                ids_by_delta.setdefault(delta, []).append(pk)
+        DailyEngineerTaskCount.objects.filter(pk__in=[pk for ids in ids_by_delta.values() for pk in ids]).update(
+            count=Case(
+                *[When(pk__in=ids, then=F('count') + delta) for delta, ids in ids_by_delta.items()],
+                default=F('count'),
+                output_field=IntegerField(),
+            )
+        )
+
+
+def rebuild():
+    """Recompute the whole rollup table from TaskSubmission and the task archive; returns the number of buckets.
+
+    Archived tasks still count on the days they were submitted, as they did
+    before they were moved.
+    """
+    counts = Counter(rollup_key(task) for task, _ in archived_tasks())
+    buckets = (
+        TaskSubmission.objects.values('submitted_on', 'engineer_id', 'task_type')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    for b in buckets.iterator():
+        counts[(b['submitted_on'], b['engineer_id'], b['task_type'])] += b['count']
+    with transaction.atomic():
+        DailyEngineerTaskCount.objects.all().delete()
+        created = DailyEngineerTaskCount.objects.bulk_create(
+            (DailyEngineerTaskCount(date=day, engineer_id=engineer_id, task_type=task_type, count=count)
+             for (day, engineer_id, task_type), count in counts.items()),
+            batch_size=1000,
+        )
+    return len(created)
+
+
+def engineer_summary(day=None):
+    """Engineers who are not team leaders, each with pm/rt/mt/total counts for ``day`` (or all time).
+
+    One grouped query over the rollup table, joined per engineer.
+    """
+    relation = 'daily_task_counts'
+    engineers = Engineer.objects.filter(is_team_leader=False)
+    if day:
+        engineers = engineers.annotate(
+            day_counts=FilteredRelation(relation, condition=Q(daily_task_counts__date=day)),
+        )
+        relation = 'day_counts'
+
+    def total(task_type=None):
+        type_filter = Q(**{f'{relation}__task_type': task_type}) if task_type else None
+        return Coalesce(Sum(f'{relation}__count', filter=type_filter), 0)
+
+    return engineers.annotate(pm=total('PM'), rt=total('RT'), mt=total('MT'), total=total()).order_by('id')
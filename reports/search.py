@@ -0,0 +1,148 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import TaskSubmission
+
+SEARCH_FIELDS = ('description', 'cause_of_problem', 'corrective_measure')
+
+FTS_TABLE = 'reports_task_fts'
+_FTS_TRIGGERS = {
+    'reports_task_fts_ai': f"""
+        CREATE TRIGGER IF NOT EXISTS reports_task_fts_ai AFTER INSERT ON reports_tasksubmission BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, description, cause_of_problem, corrective_measure)
+            VALUES (new.id, new.description, new.cause_of_problem, new.corrective_measure);
+        END""",
+    'reports_task_fts_ad': f"""
+        CREATE TRIGGER IF NOT EXISTS reports_task_fts_ad AFTER DELETE ON reports_tasksubmission BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description, cause_of_problem, corrective_measure)
+            VALUES ('delete', old.id, old.description, old.cause_of_problem, old.corrective_measure);
+        END""",
+    'reports_task_fts_au': f"""
+        CREATE TRIGGER IF NOT EXISTS reports_task_fts_au
+        AFTER UPDATE OF description, cause_of_problem, corrective_measure ON reports_tasksubmission BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description, cause_of_problem, corrective_measure)
+            VALUES ('delete', old.id, old.description, old.cause_of_problem, old.corrective_measure);
+            INSERT INTO {FTS_TABLE}(rowid, description, cause_of_problem, corrective_measure)
+            VALUES (new.id, new.description, new.cause_of_problem, new.corrective_measure);
+        END""",
+}
+
+_PG_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(description, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(cause_of_problem, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(corrective_measure, '')), 'B')"
+)
+
+
+def ensure_search_index(conn=None):
+    """Create the full-text index and the database-side sync if they are missing.
+
+    SQLite gets an FTS5 table over the task text kept in step by triggers;
+    PostgreSQL a generated tsvector column with a GIN index. Either way every
+    insert, update and delete (bulk ones included) is indexed by the database
+    itself. Idempotent: it runs after every migrate, because rebuilding the
+    task table on SQLite drops its triggers, in which case the index is
+    rebuilt from the table.
+    """
+    conn = conn or connection
+    with conn.cursor() as cursor:
+        if conn.vendor == 'sqlite':
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                "description, cause_of_problem, corrective_measure, "
+                "content='reports_tasksubmission', content_rowid='id', tokenize='porter unicode61')"
+            )
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name IN (%s)" % ', '.join(['%s'] * len(_FTS_TRIGGERS)),
+                list(_FTS_TRIGGERS),
+            )
+            if len(cursor.fetchall()) < len(_FTS_TRIGGERS):
+                for sql in _FTS_TRIGGERS.values():
+                    cursor.execute(sql)
+                cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+        elif conn.vendor == 'postgresql':
+            cursor.execute(
+                "ALTER TABLE reports_tasksubmission ADD COLUMN IF NOT EXISTS search_vector tsvector "
+                f"GENERATED ALWAYS AS ({_PG_VECTOR}) STORED"
+            )
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS task_search_vector_gin ON reports_tasksubmission USING GIN (search_vector)"
+            )
+
+
+def drop_search_index(conn=None):
+    conn = conn or connection
+    with conn.cursor() as cursor:
+        if conn.vendor == 'sqlite':
+            for name in _FTS_TRIGGERS:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+        elif conn.vendor == 'postgresql':
+            cursor.execute("ALTER TABLE reports_tasksubmission DROP COLUMN IF EXISTS search_vector")
+
+
+def search_terms(query):
+    """Words of a user query; anything else (operators, quotes) is dropped."""
+    return re.findall(r'\w+', query or '')[:10]
+
+
+def _filters(equipment_type, location):
+    clauses, params = [], []
+    if equipment_type:
+        clauses.append('t.equipment_type = %s')
+        params.append(equipment_type)
+    if location:
+        clauses.append('t.location = %s')
+        params.append(location)
+    return ''.join(f' AND {clause}' for clause in clauses), params
+
+
+def _ranked_ids(terms, equipment_type, location, limit, offset):
+    where, params = _filters(equipment_type, location)
+    if connection.vendor == 'sqlite':
+        # Every word must match; the last one as a prefix, so partial input already finds results
+        match = ' '.join(f'"{term}"' for term in terms[:-1]) + f' "{terms[-1]}"*'
+        sql = (
+            f"SELECT t.id FROM {FTS_TABLE} JOIN reports_tasksubmission t ON t.id = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH %s{where} "
+            f"ORDER BY bm25({FTS_TABLE}, 2.0, 1.0, 1.0), t.submitted_at DESC LIMIT %s OFFSET %s"
+        )
+    else:
+        match = ' & '.join(f"{term}:*" if i == len(terms) - 1 else term for i, term in enumerate(terms))
+        sql = (
+            "SELECT t.id FROM reports_tasksubmission t, to_tsquery('english', %s) query "
+            f"WHERE t.search_vector @@ query{where} "
+            "ORDER BY ts_rank(t.search_vector, query) DESC, t.submitted_at DESC LIMIT %s OFFSET %s"
+        )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [match, *params, limit, offset])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_tasks(query, equipment_type=None, location=None, page=1, page_size=20):
+    """One page of tasks matching ``query``, best match first.
+
+    Returns ``(tasks, has_next)``. Uses the full-text index on SQLite and
+    PostgreSQL; other databases fall back to icontains, newest first.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return [], False
+    offset = (page - 1) * page_size
+    if connection.vendor in ('sqlite', 'postgresql'):
+        ids = _ranked_ids(terms, equipment_type, location, page_size + 1, offset)
+        by_id = TaskSubmission.objects.select_related('engineer').in_bulk(ids[:page_size])
+        tasks = [by_id[pk] for pk in ids[:page_size] if pk in by_id]
+        return tasks, len(ids) > page_size
+
+    tasks = TaskSubmission.objects.select_related('engineer')
+    for term in terms:
+        tasks = tasks.filter(Q(*[Q(**{f'{field}__icontains': term}) for field in SEARCH_FIELDS], _connector=Q.OR))
+    if equipment_type:
+        tasks = tasks.filter(equipment_type=equipment_type)
+    if location:
+        tasks = tasks.filter(location=location)
+    tasks = list(tasks.order_by('-submitted_at', '-id')[offset:offset + page_size + 1])
+    return tasks[:page_size], len(tasks) > page_size
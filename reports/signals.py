@@ -0,0 +1,83 @@
+from django.db import connections
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save, pre_save
+from django.utils import timezone
+from django.dispatch import receiver
+
+from . import rollups, search
+from .models import DataVersion, Engineer, TaskSubmission, TaskTombstone
+
+
+@receiver(post_save, sender=TaskSubmission)
+@receiver(post_delete, sender=TaskSubmission)
+@receiver(post_save, sender=Engineer)
+@receiver(post_delete, sender=Engineer)
+def bump_tasks_version(sender, **kwargs):
+    DataVersion.bump(DataVersion.TASKS)
+
+
+@receiver(post_save, sender=Engineer)
+@receiver(post_delete, sender=Engineer)
+def bump_engineers_version(sender, **kwargs):
+    DataVersion.bump(DataVersion.ENGINEERS)
+
+
+@receiver(m2m_changed, sender=TaskSubmission.team_members.through)
+def bump_tasks_version_on_team_change(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        DataVersion.bump(DataVersion.TASKS)
+
+
+@receiver(m2m_changed, sender=TaskSubmission.team_members.through)
+def touch_tasks_on_team_change(sender, instance, action, reverse, pk_set, **kwargs):
+    # Team member edits don't save the task, but the change feed must see them
+    if reverse:
+        if action == "pre_clear":
+            pk_set = set(instance.tasks_assigned.values_list("pk", flat=True))
+        elif action not in ("post_add", "post_remove"):
+            return
+    elif action in ("post_add", "post_remove", "post_clear"):
+        pk_set = {instance.pk}
+    else:
+        return
+    if pk_set:
+        TaskSubmission.objects.filter(pk__in=pk_set).update(updated_at=timezone.now())
+
+
+@receiver(post_delete, sender=TaskSubmission)
+def record_tombstone(sender, instance, **kwargs):
+    TaskTombstone.objects.create(task_id=instance.pk)
+
+
+@receiver(pre_save, sender=TaskSubmission)
+def remember_rollup_key(sender, instance, raw=False, **kwargs):
+    # Rows saved without having been loaded (or loaded with deferred fields) need one lookup
+    if raw or instance.pk is None or rollups.loaded_rollup_key(instance) is not None:
+        return
+    previous = TaskSubmission.objects.filter(pk=instance.pk).values('submitted_on', 'engineer_id', 'task_type').first()
+    if previous:
+        instance._loaded_values = previous
+
+
+@receiver(post_save, sender=TaskSubmission)
+def update_daily_rollup(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    key = rollups.rollup_key(instance)
+    previous = None if created else rollups.loaded_rollup_key(instance)
+    if previous != key:
+        if previous is not None:
+            rollups.adjust(previous, -1)
+        rollups.adjust(key, 1)
+    rollups.remember_rollup_key(instance)
+
+
+@receiver(post_delete, sender=TaskSubmission)
+def remove_from_daily_rollup(sender, instance, **kwargs):
+    rollups.adjust(rollups.loaded_rollup_key(instance) or rollups.rollup_key(instance), -1)
+
+
+@receiver(post_migrate)
+def restore_search_index(sender, using, plan=None, **kwargs):
+    # Rebuilding the task table on SQLite drops its triggers; put them back (and reindex)
+    if sender.name == 'reports' and any(migration.app_label == 'reports' for migration, _ in plan or ()):
+        search.ensure_search_index(connections[using])
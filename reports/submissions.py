@@ -0,0 +1,38 @@
+from collections import Counter
+
+from django.db import transaction
+
+from . import rollups
+from .models import DataVersion, TaskSubmission
+
+
+def bulk_create_tasks(entries, batch_size=500):
+    """Insert tasks and their team members in one transaction.
+
+    ``entries`` is an iterable of ``(task, team_member_ids)`` with unsaved
+    tasks. bulk_create skips save() and the model signals, so this also does
+    what they would: fills derived fields, updates the daily rollup and bumps
+    the tasks data version. Query count depends on batches, not rows.
+    """
+    entries = list(entries)
+    if not entries:
+        return []
+    for task, _ in entries:
+        task.set_derived_fields()
+
+    Membership = TaskSubmission.team_members.through
+    with transaction.atomic():
+        tasks = TaskSubmission.objects.bulk_create([task for task, _ in entries], batch_size=batch_size)
+        Membership.objects.bulk_create(
+            [
+                Membership(tasksubmission_id=task.pk, engineer_id=engineer_id)
+                for task, member_ids in entries
+                for engineer_id in set(member_ids)
+            ],
+            batch_size=batch_size,
+        )
+        rollups.add_counts(Counter(rollups.rollup_key(task) for task in tasks))
+        DataVersion.bump(DataVersion.TASKS)
+    for task in tasks:
+        rollups.remember_rollup_key(task)
+    return tasks
@@ -0,0 +1,259 @@
+import csv
+import hashlib
+import os
+import time
+from datetime import date, datetime, time as dt_time
+from itertools import islice
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .exports import TASK_COLUMNS
+from .models import Engineer, TaskImport, TaskSubmission
+from .submissions import bulk_create_tasks
+
+# Headers that mark the header row (the export puts a title row above it)
+_REQUIRED_HEADERS = ('date', 'problem_description')
+# (header, field, max_length) of the columns copied as text
+_TEXT_COLUMNS = [
+    (header, field, TaskSubmission._meta.get_field(field).max_length)
+    for header, field in TASK_COLUMNS if field not in ('date', 'description', 'start_time', 'end_time')
+]
+# Error messages kept for the summary; the rest are only counted
+MAX_REPORTED_ERRORS = 20
+
+
+class TaskImportError(ValueError):
+    pass
+
+
+def _headers(row):
+    return [str(value).strip().lower() if value is not None else '' for value in row]
+
+
+def _blank(values):
+    return all(value is None or str(value).strip() == '' for value in values)
+
+
+def _read_csv(path, offset=None):
+    """Yield ``(values, None, offset)`` per data row of a CSV file, starting at byte ``offset``.
+
+    ``offset`` in each item is where the next row starts, which is what a
+    checkpoint stores to resume without re-reading the file.
+    """
+    with open(path, 'rb') as f:
+        header = _headers(next(csv.reader([f.readline().decode('utf-8-sig')]), []))
+        if not all(name in header for name in _REQUIRED_HEADERS):
+            raise TaskImportError(f"Unexpected CSV header {header!r}")
+        if offset:
+            f.seek(offset)
+        position = f.tell()
+
+        def lines():
+            nonlocal position
+            for line in f:
+                position += len(line)
+                yield line.decode('utf-8')
+
+        # csv pulls lines only as each record needs them, so position is the record's end
+        for row in csv.reader(lines()):
+            if not _blank(row):
+                yield dict(zip(header, row)), None, position
+
+
+def _read_workbook(path):
+    """Yield ``(values, sheet title, None)`` per data row of every sheet, in the export's layout.
+
+    Streams the workbook in openpyxl read-only mode. Sheets are named after
+    the engineer's ET ID, as the Excel export names them; sheets without a
+    header row are ignored.
+    """
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        for ws in wb.worksheets:
+            rows = ws.iter_rows(values_only=True)
+            header = next((cells for cells in map(_headers, rows) if all(name in cells for name in _REQUIRED_HEADERS)), None)
+            if header is None:
+                continue
+            for row in rows:
+                if not _blank(row):
+                    yield dict(zip(header, row)), ws.title, None
+    finally:
+        wb.close()
+
+
+def _text(value):
+    return '' if value is None else str(value).strip()
+
+
+def _date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    day = parse_date(_text(value)) if _text(value) else None
+    if day is None:
+        raise ValueError(f"date must be YYYY-MM-DD, got {value!r}")
+    return day
+
+
+def _datetime(value):
+    if value is None or value == '':
+        return None
+    if not isinstance(value, datetime):
+        parsed = parse_datetime(_text(value))
+        if parsed is None:
+            raise ValueError(f"expected YYYY-MM-DD HH:MM, got {value!r}")
+        value = parsed
+    # The export writes local wall-clock times
+    return timezone.make_aware(value) if timezone.is_naive(value) else value
+
+
+def is_team_copy(values, sheet, engineers):
+    """Whether a workbook row is the Excel export's copy of a team task on a team member's sheet.
+
+    The export lists a team task on every participant's sheet with the
+    task's own engineer in its et_id column; it is imported once, from that
+    engineer's sheet, with the team from its team_members column.
+    """
+    et_id, sheet = _text(values.get('et_id')), _text(sheet)
+    return bool(et_id) and sheet in engineers and et_id != sheet
+
+
+def parse_row(values, sheet, engineers, default_task_type=None):
+    """``(task, team_member_ids)`` for one row of an import file; ValueError if it is invalid.
+
+    ``engineers`` maps ET ID -> Engineer id. The engineer is the row's
+    ``et_id`` column or else the sheet name; optional ``task_type`` and
+    ``team_members`` (comma-separated ET IDs) columns complete the export
+    layout.
+    """
+    et_id = _text(values.get('et_id')) or _text(sheet)
+    if et_id not in engineers:
+        raise ValueError(f"unknown engineer ET ID {et_id!r}")
+    task_type = (_text(values.get('task_type')) or default_task_type or '').upper()
+    if task_type not in dict(TaskSubmission.TASK_TYPES):
+        raise ValueError(f"task_type must be PM, RT or MT, got {task_type!r}")
+    description = _text(values.get('problem_description'))
+    if not description:
+        raise ValueError("problem_description is empty")
+
+    fields = {}
+    for header, field, max_length in _TEXT_COLUMNS:
+        fields[field] = _text(values.get(header))
+        if max_length and len(fields[field]) > max_length:
+            raise ValueError(f"{header} is longer than {max_length} characters")
+    day = _date(values.get('date'))
+    start, end = _datetime(values.get('start_time')), _datetime(values.get('end_time'))
+
+    member_ids = []
+    for member in _text(values.get('team_members')).split(','):
+        member = member.strip()
+        if member:
+            if member not in engineers:
+                raise ValueError(f"unknown team member ET ID {member!r}")
+            member_ids.append(engineers[member])
+
+    task = TaskSubmission(
+        engineer_id=engineers[et_id], task_type=task_type, date=day, description=description,
+        start_time=start, end_time=end, **fields,
+        # Historical tasks count on the day they were done, not the day they were imported
+        submitted_at=end or start or timezone.make_aware(datetime.combine(day, dt_time.min)),
+    )
+    return task, member_ids
+
+
+def import_tasks(path, task_type=None, batch_size=5000, restart=False, progress=None):
+    """Import tasks from an Excel workbook or CSV file in the export_excel column layout.
+
+    Rows are streamed and inserted through bulk_create_tasks() in batches of
+    ``batch_size``; engineers are resolved through one ET ID -> id map.
+    Each batch commits together with the file's TaskImport checkpoint, so
+    running the import again after an interruption continues after the last
+    committed batch without duplicating rows. Checkpoints are keyed by the
+    file's SHA-256, so a different file of the same name starts afresh and a
+    copy of an imported file is refused. Invalid rows are skipped and
+    reported. ``progress(checkpoint, rows_per_second)`` is called after each
+    batch. Returns a summary dict.
+    """
+    source, file_size = os.path.basename(path), os.path.getsize(path)
+    with open(path, 'rb') as f:
+        digest = hashlib.file_digest(f, 'sha256').hexdigest()
+    with transaction.atomic():
+        checkpoint = TaskImport.objects.select_for_update().filter(sha256=digest).first()
+        if checkpoint is None:
+            # A checkpoint from before content hashes were kept resumes as it used to, by name and size
+            checkpoint = TaskImport.objects.select_for_update().filter(
+                sha256__isnull=True, source=source, file_size=file_size,
+            ).first()
+        if checkpoint and restart:
+            checkpoint.delete()
+            checkpoint = None
+        if checkpoint is None:
+            try:
+                with transaction.atomic():
+                    checkpoint = TaskImport.objects.create(source=source, file_size=file_size, sha256=digest)
+            except IntegrityError:
+                raise TaskImportError(f"{source} is being imported by another run") from None
+        elif checkpoint.finished_at:
+            copy = f" as {checkpoint.source}" if checkpoint.source != source else ""
+            raise TaskImportError(f"{source} was already imported{copy}; use --restart to import it again")
+        elif checkpoint.sha256 is None:
+            checkpoint.sha256 = digest
+            checkpoint.save(update_fields=['sha256'])
+
+    if path.lower().endswith('.csv'):
+        rows = _read_csv(path, checkpoint.offset)
+    else:
+        rows = islice(_read_workbook(path), checkpoint.rows_read, None)
+    engineers = dict(Engineer.objects.values_list('et_id', 'pk'))
+    resumed_from = checkpoint.rows_read
+    started = time.monotonic()
+    batch, batch_skipped, errors = [], 0, []
+    read = imported = skipped = 0
+
+    def commit(offset):
+        nonlocal batch, batch_skipped
+        with transaction.atomic():
+            # Another run of the same file moves the checkpoint on (or deletes it, with --restart)
+            # under this one; the batch is then rolled back rather than imported twice
+            saved = TaskImport.objects.select_for_update().filter(pk=checkpoint.pk).values_list('rows_read', flat=True).first()
+            if saved != checkpoint.rows_read:
+                raise TaskImportError(f"{source} is being imported by another run; stopped after row {checkpoint.rows_read}")
+            bulk_create_tasks(batch, batch_size=1000)
+            checkpoint.rows_read = resumed_from + read
+            checkpoint.offset = offset
+            checkpoint.rows_imported += len(batch)
+            checkpoint.rows_skipped += batch_skipped
+            checkpoint.save()
+        batch, batch_skipped = [], 0
+        if progress:
+            progress(checkpoint, read / max(time.monotonic() - started, 1e-9))
+
+    offset = checkpoint.offset
+    for values, sheet, offset in rows:
+        read += 1
+        try:
+            if not is_team_copy(values, sheet, engineers):
+                batch.append(parse_row(values, sheet, engineers, task_type))
+                imported += 1
+        except ValueError as exc:
+            skipped += 1
+            batch_skipped += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append(f"Data row {resumed_from + read}{f' (sheet {sheet})' if sheet else ''}: {exc}")
+        if read % batch_size == 0:
+            commit(offset)
+    if batch or batch_skipped:
+        commit(offset)
+    checkpoint.finished_at = timezone.now()
+    checkpoint.save(update_fields=['finished_at'])
+
+    seconds = time.monotonic() - started
+    return {
+        'read': read, 'imported': imported, 'skipped': skipped, 'errors': errors,
+        'resumed_from': resumed_from, 'seconds': seconds, 'rows_per_second': read / max(seconds, 1e-9),
+    }
@@ -5,9 +5,20 @@ app_name = 'reports'
 
 urlpatterns = [
     path('submit_tasks/', views.submit_tasks, name='submit_tasks'),
+    path('engineers/autocomplete/', views.engineer_autocomplete, name='engineer_autocomplete'),
     path('submission_confirmation/', views.submission_confirmation, name='submission_confirmation'),
     path('dashboard/', views.dashboard, name='dashboard'),
+    path('tasks/<int:task_id>/details/', views.task_detail, name='task_detail'),
     path('export_excel/', views.export_excel, name='export_excel'),
     path('export_pdf/', views.export_pdf, name='export_pdf'),
+    path('export_jobs/', views.export_job_submit, name='export_job_submit'),
+    path('export_jobs/<int:job_id>/', views.export_job_status, name='export_job_status'),
+    path('export_jobs/<int:job_id>/download/', views.export_job_download, name='export_job_download'),
     path('download_inventory/', views.download_inventory, name='download_inventory'),
+    path('upload_inventory/', views.upload_inventory, name='upload_inventory'),
+    path('search/', views.search_tasks, name='search_tasks'),
+    path('analytics/', views.repair_analytics, name='repair_analytics'),
+    path('api/tasks/', views.api_tasks, name='api_tasks'),
+    path('api/tasks/changes/', views.api_task_changes, name='api_task_changes'),
+    path('metrics/', views.metrics, name='metrics'),
 ]
\ No newline at end of file
@@ -1,21 +1,57 @@
-from django.shortcuts import render, redirect
-from django.contrib.auth.decorators import login_required
-from .forms import TaskSubmissionFormSet
-from .models import TaskSubmission, Engineer, InventoryItem
-from django.db.models import Count, Q
-from django.http import HttpResponse
-import pandas as pd
-from weasyprint import HTML
+from django.shortcuts import render, redirect, get_object_or_404
+from django.contrib.auth.decorators import login_required, permission_required
+from .forms import TaskSubmissionFormSet, InventoryUploadForm
+from .models import TaskSubmission, Engineer, InventoryItem, ExportJob
+from .jobs import submit_export_job
+from . import dashboard_cache
+from .pagination import akeyset_page, keyset_page
+from .submissions import bulk_create_tasks
+from .inventory import INVENTORY_HEADERS, InventoryImportError, import_inventory_workbook
+from django.http import HttpResponse, FileResponse, JsonResponse, Http404, StreamingHttpResponse
+from django.db.models import Q
+from django.urls import reverse
+from django.utils.dateparse import parse_date
+from django.views.decorators.http import condition, require_POST
+from .exports import EXPORT_BACKENDS, get_export_backend, parse_date_range
+from .export_cache import render_to_cache
+from .pool import run_in_pool
+from .metrics import render_prometheus
+from .search import search_tasks as run_task_search
+from . import analytics
+from .changes import changes, decode_watermark
+from .api import (
+    API_MAX_PAGE_SIZE, API_PAGE_SIZE, APIError, filtered_tasks, parse_fields, select_fields, serialize_task, tasks_etag,
+)
+import asyncio
 import io
+import os
+from zipfile import BadZipFile
+from functools import wraps
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.core.handlers.asgi import ASGIRequest
 from django.utils import timezone
-from datetime import datetime
+from django.utils.http import content_disposition_header
 from django.contrib.auth.decorators import user_passes_test
-import os
+
+DASHBOARD_PAGE_SIZE = 50
+EXPORT_CHUNK_SIZE = 64 * 1024
+ENGINEER_AUTOCOMPLETE_LIMIT = 20
+
+def _forbidden():
+    return HttpResponse("You do not have permission to access this page.", status=403)
 
 def team_leader_required(view_func):
+    if iscoroutinefunction(view_func):
+        async def _async_wrapped_view(request, *args, **kwargs):
+            user = await request.auser()
+            if not await Engineer.objects.filter(user_id=user.pk, is_team_leader=True).aexists():
+                return _forbidden()
+            return await view_func(request, *args, **kwargs)
+        return wraps(view_func)(_async_wrapped_view)
+
     def _wrapped_view(request, *args, **kwargs):
         if not hasattr(request.user, 'engineer') or not request.user.engineer.is_team_leader:
-            return HttpResponse("You do not have permission to access this page.", status=403)
+            return _forbidden()
         return view_func(request, *args, **kwargs)
     return _wrapped_view
 
@@ -25,24 +61,21 @@ def submit_tasks(request):
         formset = TaskSubmissionFormSet(request.POST)
         if formset.is_valid():
             saved_tasks = []
-            for form in formset.forms:
-                if form.cleaned_data and not form.cleaned_data.get('DELETE', False):
-                    task = form.save(commit=False)
-                    if hasattr(request.user, 'engineer') and request.user.engineer:
-                        task.engineer = request.user.engineer
-                        if not task.reporter:
-                            task.reporter = request.user.engineer.name
+            engineer = getattr(request.user, 'engineer', None)
+            if engineer:
+                entries = []
+                for form in formset.forms:
+                    if form.cleaned_data and not form.cleaned_data.get('DELETE', False):
+                        task = form.save(commit=False)
+                        task.engineer = engineer
                         if not task.date:
                             task.date = timezone.now().date()
-                        task.save()
-                        form.save_m2m()
-                        # If reporter is blank or equals the primary engineer, append team members to it
-                        if hasattr(request.user, 'engineer'):
-                            names = [request.user.engineer.name] + [m.name for m in task.team_members.all()]
-                            if not task.reporter or task.reporter.strip() == request.user.engineer.name.strip():
-                                task.reporter = ", ".join(names)
-                                task.save(update_fields=['reporter'])
-                        saved_tasks.append(task)
+                        members = list(form.cleaned_data.get('team_members') or [])
+                        # If reporter is blank or equals the primary engineer, list the team members too
+                        if not task.reporter or task.reporter.strip() == engineer.name.strip():
+                            task.reporter = ", ".join([engineer.name] + [m.name for m in members])
+                        entries.append((task, [m.pk for m in members]))
+                saved_tasks = bulk_create_tasks(entries)
             if saved_tasks:
                 return redirect('reports:submission_confirmation')
     else:
@@ -55,166 +88,138 @@ def submit_tasks(request):
         formset = TaskSubmissionFormSet(initial=initial or None)
     return render(request, 'submit_tasks.html', {'formset': formset})
 
+@login_required
+def engineer_autocomplete(request):
+    """Engineers whose ET ID starts with, or name contains, ``q``; for the team member picker."""
+    query = request.GET.get('q', '').strip()
+    engineers = Engineer.objects.none()
+    if query:
+        engineers = Engineer.objects.filter(Q(et_id__istartswith=query) | Q(name__icontains=query))
+    results = engineers.order_by('name').values('id', 'et_id', 'name')[:ENGINEER_AUTOCOMPLETE_LIMIT]
+    return JsonResponse({'results': [
+        {**engineer, 'label': f"{engineer['name']} (ET-{engineer['et_id']})"} for engineer in results
+    ]})
+
 @login_required
 def submission_confirmation(request):
     return render(request, 'submission_confirmation.html')
 
 @team_leader_required
 @login_required
-def dashboard(request):
+async def dashboard(request):
     selected_date = request.GET.get('date')
-    tasks = TaskSubmission.objects.all().order_by('-submitted_at')
-    unique_dates = TaskSubmission.objects.dates('submitted_at', 'day', order='DESC')
+    cursor = request.GET.get('after')
+    tasks = TaskSubmission.objects.all()
+    version = await dashboard_cache.acurrent_version()
+    unique_dates = await dashboard_cache.asubmission_dates(version)
 
-    if selected_date:
-        tasks = tasks.filter(submitted_at__date=selected_date)
+    try:
+        day = parse_date(selected_date) if selected_date else None
+    except ValueError:
+        day = None
+    if day:
+        tasks = tasks.filter(submitted_on=day)
 
-    summary = tasks.values('engineer__et_id', 'engineer__name', 'task_type').annotate(count=Count('task_type'))
-    # Exclude team leaders from the engineers list shown in the table
-    engineers = Engineer.objects.filter(is_team_leader=False)
-    task_details = tasks.select_related('engineer').prefetch_related('team_members')
+    # PM/RT/MT/total per engineer (team leaders excluded), pre-pivoted from the daily rollup
+    summary_table = await dashboard_cache.asummary_table(version, day)
+    task_details, next_cursor = await akeyset_page(tasks.select_related('engineer'), cursor, DASHBOARD_PAGE_SIZE)
 
     return render(request, 'dashboard.html', {
-        'summary': summary,
-        'engineers': engineers,
+        'summary_table': summary_table,
         'task_details': task_details,
+        'cursor': cursor,
+        'next_cursor': next_cursor,
         'unique_dates': unique_dates,
         'selected_date': selected_date,
     })
 
+@team_leader_required
 @login_required
-def export_excel(request):
-    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-    from openpyxl.utils import get_column_letter
+def task_detail(request, task_id):
+    task = get_object_or_404(TaskSubmission, pk=task_id)
+    return JsonResponse({
+        'id': task.pk,
+        'description': task.description,
+        'cause_of_problem': task.cause_of_problem,
+        'corrective_measure': task.corrective_measure,
+        'equipment_type': task.equipment_type,
+    })
 
-    date_from = request.GET.get('date_from')
-    date_to = request.GET.get('date_to')
-    tasks = TaskSubmission.objects.select_related('engineer').prefetch_related('team_members').all()
-    if date_from and date_to:
-        try:
-            start_date = datetime.strptime(date_from, '%Y-%m-%d').replace(hour=0, minute=0, second=0)
-            end_date = datetime.strptime(date_to, '%Y-%m-%d').replace(hour=23, minute=59, second=59)
-            tasks = tasks.filter(submitted_at__range=[start_date, end_date])
-        except ValueError:
-            pass
+async def _read_chunks(path):
+    with await asyncio.to_thread(open, path, 'rb') as f:
+        while chunk := await asyncio.to_thread(f.read, EXPORT_CHUNK_SIZE):
+            yield chunk
+
+async def _export_response(request, kind):
+    date_from, date_to = parse_date_range(request.GET.get('date_from'), request.GET.get('date_to'))
+    backend = get_export_backend(kind)
+    if not isinstance(request, ASGIRequest):
+        # Under WSGI the request has its own thread to block, so it renders in-process
+        path = await sync_to_async(render_to_cache)(kind, date_from, date_to)
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=backend.filename, content_type=backend.content_type)
+    # Rendering is CPU-bound: run it in the process pool so the event loop keeps serving requests
+    path = await run_in_pool(render_to_cache, kind, date_from, date_to)
+    # FileResponse reads its file synchronously, so under ASGI stream it in chunks read off the loop
+    response = StreamingHttpResponse(_read_chunks(path), content_type=backend.content_type)
+    response['Content-Length'] = os.path.getsize(path)
+    response['Content-Disposition'] = content_disposition_header(True, backend.filename)
+    return response
 
-    et_green = "008751"
-    et_yellow = "FFC107"
+@login_required
+async def export_excel(request):
+    return await _export_response(request, 'excel')
 
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        primary_ids = tasks.values_list('engineer_id', flat=True)
-        member_ids = tasks.values_list('team_members__id', flat=True)
-        all_ids = {i for i in primary_ids if i is not None} | {i for i in member_ids if i is not None}
-        engineers = Engineer.objects.filter(id__in=all_ids)
-        for engineer in engineers:
-            eng_tasks = tasks.filter(Q(engineer=engineer) | Q(team_members=engineer)).distinct()
-            rows = []
-            for t in eng_tasks:
-                rows.append({
-                    'date': t.date,
-                    'shift': t.shift,
-                    'reporter': t.reporter or engineer.name,
-                    'location': t.location,
-                    'equipment_type': t.equipment_type,
-                    'problem_description': t.description,
-                    'cause_of_problem': t.cause_of_problem,
-                    'corrective_action': t.corrective_measure,
-                    'start_time': timezone.make_naive(t.start_time, timezone.get_default_timezone()) if t.start_time and timezone.is_aware(t.start_time) else t.start_time,
-                    'end_time': timezone.make_naive(t.end_time, timezone.get_default_timezone()) if t.end_time and timezone.is_aware(t.end_time) else t.end_time,
-                    'time_taken': (str(t.time_taken) if t.time_taken is not None else ''),
-                    'status': t.status,
-                    'remark': t.remark,
-                })
-            df = pd.DataFrame(rows)
-            if df.empty:
-                df = pd.DataFrame(columns=[
-                    'date','shift','reporter','location','equipment_type','problem_description',
-                    'cause_of_problem','corrective_action','start_time','end_time','time_taken','status','remark'
-                ])
-            sheet_name = f"{engineer.et_id}"[:31]
-            df.to_excel(writer, sheet_name=sheet_name, index=False)
-
-            ws = writer.sheets[sheet_name]
-            header_font = Font(bold=True, color="FFFFFF")
-            header_fill = PatternFill(start_color=et_green, end_color=et_green, fill_type="solid")
-            thin = Side(border_style="thin", color="000000")
-            border = Border(left=thin, right=thin, top=thin, bottom=thin)
-            center = Alignment(vertical="center", wrap_text=True)
-
-            max_col = ws.max_column
-            max_row = ws.max_row
-
-            for col in range(1, max_col + 1):
-                cell = ws.cell(row=1, column=col)
-                cell.font = header_font
-                cell.fill = header_fill
-                cell.alignment = center
-                cell.border = border
-
-            alt_fill = PatternFill(start_color="F5F5F5", end_color="F5F5F5", fill_type="solid")
-            for row in range(2, max_row + 1):
-                for col in range(1, max_col + 1):
-                    cell = ws.cell(row=row, column=col)
-                    if row % 2 == 0:
-                        cell.fill = alt_fill
-                    cell.border = border
-                    cell.alignment = Alignment(wrap_text=True)
-
-            for col in range(1, max_col + 1):
-                max_length = 0
-                for row in range(1, max_row + 1):
-                    cell = ws.cell(row=row, column=col)
-                    value = cell.value
-                    if value is not None:
-                        length = len(str(value))
-                        if length > max_length:
-                            max_length = length
-                    cell.alignment = Alignment(wrap_text=True, shrink_to_fit=True)
-                ws.column_dimensions[get_column_letter(col)].width = min(max_length + 6, 120)
-
-            ws.insert_rows(1)
-            ws.merge_cells(start_row=1, start_column=1, end_row=1, end_column=max_col)
-            title_cell = ws.cell(row=1, column=1)
-            title_cell.value = f"Ethiopian Airlines - Engineer {engineer.name} ({engineer.et_id})"
-            title_cell.font = Font(bold=True, color="000000", size=14)
-            title_cell.fill = PatternFill(start_color=et_yellow, end_color=et_yellow, fill_type="solid")
-            title_cell.alignment = Alignment(horizontal="center", vertical="center")
+@login_required
+async def export_pdf(request):
+    return await _export_response(request, 'pdf')
+
+def _export_job_payload(job):
+    payload = {
+        'id': job.pk,
+        'kind': job.kind,
+        'status': job.status,
+        'status_url': reverse('reports:export_job_status', args=[job.pk]),
+    }
+    if job.status == ExportJob.STATUS_DONE:
+        payload['download_url'] = reverse('reports:export_job_download', args=[job.pk])
+    elif job.status == ExportJob.STATUS_FAILED:
+        payload['error'] = "Export failed, please try again."
+    return payload
+
+def _get_user_export_job(request, job_id):
+    job = get_object_or_404(ExportJob, pk=job_id)
+    if job.requested_by_id != request.user.pk and not request.user.is_staff:
+        raise Http404("No such export job.")
+    return job
 
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename=tasks_by_engineer.xlsx'
-    response.write(output.getvalue())
-    return response
+@login_required
+@require_POST
+def export_job_submit(request):
+    kind = request.POST.get('kind')
+    if kind not in EXPORT_BACKENDS:
+        return JsonResponse({'error': "Unknown export type."}, status=400)
+    try:
+        date_from = parse_date(request.POST.get('date_from') or '')
+        date_to = parse_date(request.POST.get('date_to') or '')
+    except ValueError:
+        date_from = date_to = None
+    # Same rule as the synchronous exports: only a complete range filters
+    if not (date_from and date_to):
+        date_from = date_to = None
+
+    job = submit_export_job(request.user, kind, date_from, date_to)
+    return JsonResponse(_export_job_payload(job), status=202)
 
 @login_required
-def export_pdf(request):
-    date_from = request.GET.get('date_from')
-    date_to = request.GET.get('date_to')
-    tasks = TaskSubmission.objects.all()
-    if date_from and date_to:
-        try:
-            start_date = datetime.strptime(date_from, '%Y-%m-%d').replace(hour=0, minute=0, second=0)
-            end_date = datetime.strptime(date_to, '%Y-%m-%d').replace(hour=23, minute=59, second=59)
-            tasks = tasks.filter(submitted_at__range=[start_date, end_date])
-        except ValueError:
-            pass
-
-    summary = tasks.values(
-        'engineer__et_id', 'engineer__name', 'task_type',
-        'submitted_at', 'shift', 'location', 'equipment_type',
-        'description', 'cause_of_problem', 'corrective_measure',
-        'start_time', 'end_time'
-    ).annotate(count=Count('task_type'))
-    engineers = Engineer.objects.all()
-
-    totals = [{'et_id': engineer.et_id, 'total': sum(count['count'] for count in summary if count['engineer__et_id'] == engineer.et_id)} for engineer in engineers]
-
-    html = render(request, 'pdf_template.html', {'summary': summary, 'engineers': engineers, 'totals': totals}).content.decode('utf-8')
-
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = 'attachment; filename=task_summary.pdf'
-    HTML(string=html, base_url=request.build_absolute_uri()).write_pdf(response, stylesheets=['/static/css/pdf_styles.css'] if os.path.exists('/static/css/pdf_styles.css') else [])
-    return response
+def export_job_status(request, job_id):
+    return JsonResponse(_export_job_payload(_get_user_export_job(request, job_id)))
+
+@login_required
+def export_job_download(request, job_id):
+    job = _get_user_export_job(request, job_id)
+    if job.status != ExportJob.STATUS_DONE or not job.file:
+        raise Http404("Export is not ready.")
+    return FileResponse(job.file.open('rb'), as_attachment=True, filename=get_export_backend(job.kind).filename)
 
 @login_required
 def download_inventory(request):
@@ -224,15 +229,16 @@ def download_inventory(request):
     from openpyxl.worksheet.datavalidation import DataValidation
     from openpyxl.formatting.rule import FormulaRule
 
-    # Items: use current quantity as initial "in" (editable in sheet), start "out" at 0
+    # Items: use current quantity as initial "in" (editable in sheet), start "out" at 0, and keep
+    # it in the hidden "downloaded stock" column for the upload to measure the edits against
     items = InventoryItem.objects.all().order_by('number')
 
     wb = Workbook()
     ws = wb.active
     ws.title = "Inventory"
 
-    # Columns: no., item, in, out, amount in stock
-    headers = ["no.", "item", "in", "out", "amount in stock"]
+    # Columns: no., item, in, out, amount in stock, downloaded stock (hidden)
+    headers = INVENTORY_HEADERS
     ws.append(headers)
 
     # Header styling
@@ -251,7 +257,7 @@ def download_inventory(request):
 
     # Data rows with live formula for amount in stock = in - out
     for it in items:
-        ws.append([it.number, it.item, it.quantity, 0, None])
+        ws.append([it.number, it.item, it.quantity, 0, None, it.quantity])
         r = ws.max_row
         ws.cell(row=r, column=5).value = f"=C{r}-D{r}"
 
@@ -289,6 +295,7 @@ def download_inventory(request):
             ws.cell(row=row, column=col).border = border
         # Make columns a bit wider than before
         ws.column_dimensions[get_column_letter(col)].width = min(max_len + 4, 80)
+    ws.column_dimensions[get_column_letter(len(headers))].hidden = True
 
     # Download
     output = io.BytesIO()
@@ -296,4 +303,126 @@ def download_inventory(request):
     response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
     response['Content-Disposition'] = 'attachment; filename=inventory.xlsx'
     response.write(output.getvalue())
-    return response
\ No newline at end of file
+    return response
+
+@login_required
+@permission_required('reports.change_inventoryitem', raise_exception=True)  # as the admin's stock actions
+def upload_inventory(request):
+    from openpyxl.utils.exceptions import InvalidFileException
+
+    summary = None
+    if request.method == 'POST':
+        form = InventoryUploadForm(request.POST, request.FILES)
+        if form.is_valid():
+            try:
+                summary = import_inventory_workbook(form.cleaned_data['file'], user=request.user)
+            except InventoryImportError as exc:
+                for error in exc.errors:
+                    form.add_error('file', error)
+            except (InvalidFileException, BadZipFile, KeyError):
+                form.add_error('file', "Could not read the file as an inventory workbook.")
+    else:
+        form = InventoryUploadForm()
+    return render(request, 'upload_inventory.html', {'form': form, 'summary': summary})
+
+@login_required
+def metrics(request):
+    if not request.user.is_staff:
+        return HttpResponse("You do not have permission to access this page.", status=403)
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+SEARCH_PAGE_SIZE = 20
+
+@login_required
+def search_tasks(request):
+    query = request.GET.get('q', '').strip()
+    equipment_type = request.GET.get('equipment_type') or None
+    location = request.GET.get('location') or None
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+    tasks, has_next = run_task_search(query, equipment_type, location, page, SEARCH_PAGE_SIZE)
+
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'results': [
+                {
+                    'id': task.pk,
+                    'engineer': task.engineer.name,
+                    'task_type': task.task_type,
+                    'date': task.date.isoformat() if task.date else None,
+                    'equipment_type': task.equipment_type,
+                    'location': task.location,
+                    'description': task.description,
+                    'cause_of_problem': task.cause_of_problem,
+                    'corrective_measure': task.corrective_measure,
+                }
+                for task in tasks
+            ],
+            'page': page,
+            'has_next': has_next,
+        })
+    return render(request, 'search.html', {
+        'query': query,
+        'equipment_type': equipment_type or '',
+        'location': location or '',
+        'choices': dashboard_cache.filter_choices(dashboard_cache.current_version()),
+        'tasks': tasks,
+        'page': page,
+        'has_next': has_next,
+    })
+
+@team_leader_required
+@login_required
+def repair_analytics(request):
+    dimension = request.GET.get('by')
+    if dimension not in analytics.DIMENSIONS:
+        dimension = analytics.DIMENSIONS[0]
+    date_from, date_to = parse_date_range(request.GET.get('date_from'), request.GET.get('date_to'))
+    rows = analytics.repair_time_stats(dimension, date_from, date_to)
+    for row in rows:
+        row['group'] = row[dimension] or 'N/A'
+        for key in ('mean', 'median', 'p90'):
+            row[key] = analytics.format_duration(row[f'{key}_seconds'])
+    return render(request, 'analytics.html', {
+        'rows': rows,
+        'dimension': dimension,
+        'dimensions': analytics.DIMENSIONS,
+        'date_from': date_from,
+        'date_to': date_to,
+    })
+
+@login_required
+@condition(etag_func=tasks_etag)
+def api_tasks(request):
+    """Read-only task list, newest first: ?fields=, date_from, date_to, et_id, task_type, page_size, after."""
+    try:
+        fields = parse_fields(request.GET.get('fields'))
+        tasks = filtered_tasks(request.GET)
+        page_size = min(max(int(request.GET.get('page_size', API_PAGE_SIZE)), 1), API_MAX_PAGE_SIZE)
+    except (APIError, ValueError) as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+
+    page, next_cursor = keyset_page(select_fields(tasks, fields), request.GET.get('after'), page_size)
+    next_url = None
+    if next_cursor:
+        query = request.GET.copy()
+        query['after'] = next_cursor
+        next_url = f"{request.path}?{query.urlencode()}"
+    return JsonResponse({
+        'results': [serialize_task(task, fields) for task in page],
+        'next_cursor': next_cursor,
+        'next': next_url,
+    })
+
+@login_required
+def api_task_changes(request):
+    """NDJSON stream of task upserts and deletes after ?since=<watermark> (everything without one)."""
+    watermark = request.GET.get('since')
+    try:
+        decode_watermark(watermark)
+        limit = int(request.GET['limit']) if request.GET.get('limit') else None
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    return StreamingHttpResponse(changes(watermark, limit=limit), content_type='application/x-ndjson')